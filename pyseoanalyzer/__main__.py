@@ -6,6 +6,8 @@ import json
 import os
 
 from .analyzer import analyze
+from .http import Http
+from .page import STREAM_THRESHOLD
 
 
 def main():
@@ -47,14 +49,232 @@ def main():
         help="Analyze all the existing inner links as well (might be time consuming).",
     )
 
+    arg_parser.add_argument(
+        "--concurrency",
+        default=1,
+        type=int,
+        help="Number of pages to fetch and analyze at the same time.",
+    )
+    arg_parser.add_argument(
+        "--concurrency-per-host",
+        default=None,
+        type=int,
+        help="Maximum number of requests in flight against a single host (defaults to --concurrency).",
+    )
+    arg_parser.add_argument(
+        "--analyze-workers",
+        default=0,
+        type=int,
+        help="Number of worker processes that analyze downloaded pages (0 analyzes on the fetching threads).",
+    )
+    arg_parser.add_argument(
+        "--queue-size",
+        default=None,
+        type=int,
+        help="Maximum number of downloaded pages waiting for analysis before fetching pauses.",
+    )
+    arg_parser.add_argument(
+        "--resume",
+        default=None,
+        help="Path of a checkpoint file; an interrupted crawl using the same file picks up where it stopped.",
+    )
+    arg_parser.add_argument(
+        "--http-cache",
+        default=None,
+        help="Path of a persistent HTTP cache; cached pages are revalidated instead of downloaded again.",
+    )
+    arg_parser.add_argument(
+        "--result-store",
+        default=None,
+        help="Path of a store of page analyses; unchanged pages reuse their stored analysis.",
+    )
+    arg_parser.add_argument(
+        "--delay",
+        default=0.0,
+        type=float,
+        help="Minimum number of seconds between two requests to the same host.",
+    )
+    arg_parser.add_argument(
+        "--max-pages",
+        default=None,
+        type=int,
+        help="Stop after analyzing this many pages.",
+    )
+    arg_parser.add_argument(
+        "--max-depth",
+        default=None,
+        type=int,
+        help="Do not follow links more than this many clicks away from the start.",
+    )
+    arg_parser.add_argument(
+        "--deadline",
+        default=None,
+        type=float,
+        help="Stop crawling after this many seconds and report what was analyzed so far.",
+    )
+    arg_parser.add_argument(
+        "--shards",
+        default=0,
+        type=int,
+        help="Split the crawl across this many worker processes.",
+    )
+    arg_parser.add_argument(
+        "--shard-listen",
+        default=None,
+        help="host:port to wait on for remote workers (started with python -m pyseoanalyzer.shard) instead of starting local ones.",
+    )
+    arg_parser.add_argument(
+        "--shard-authkey",
+        default=None,
+        help="Shared secret remote workers use to connect.",
+    )
+    arg_parser.add_argument(
+        "--ignore-robots",
+        action="store_true",
+        help="Crawl pages even if robots.txt disallows them.",
+    )
+    arg_parser.add_argument(
+        "--pool-size",
+        default=None,
+        type=int,
+        help="Number of connections kept open per host (defaults to --concurrency-per-host, at least 10).",
+    )
+    arg_parser.add_argument(
+        "--connect-timeout",
+        default=1.0,
+        type=float,
+        help="Seconds to wait for a connection.",
+    )
+    arg_parser.add_argument(
+        "--read-timeout",
+        default=2.0,
+        type=float,
+        help="Seconds to wait for data from a server.",
+    )
+    arg_parser.add_argument(
+        "--retries",
+        default=3,
+        type=int,
+        help="Number of times a failed request is retried.",
+    )
+    arg_parser.add_argument(
+        "--backoff-factor",
+        default=0.0,
+        type=float,
+        help="Retries sleep backoff-factor * 2 ** (retry - 1) seconds first.",
+    )
+    arg_parser.add_argument(
+        "--stream-threshold",
+        default=STREAM_THRESHOLD,
+        type=int,
+        help="Pages larger than this many bytes are analyzed while they download, without building a tree.",
+    )
+    arg_parser.add_argument(
+        "--rule",
+        dest="rules",
+        default=None,
+        action="append",
+        help="Run only this check (repeat for several, defaults to all of them).",
+    )
+    arg_parser.add_argument(
+        "--disable-rule",
+        dest="disabled_rules",
+        default=[],
+        action="append",
+        help="Skip this check (repeat for several).",
+    )
+    arg_parser.add_argument(
+        "--stem-table",
+        default=None,
+        help="Path of a stem table saved with pyseoanalyzer.stemmer.build_stem_table; its words are looked up instead of stemmed.",
+    )
+    arg_parser.add_argument(
+        "--text-engine",
+        default="python",
+        choices=["python", "numpy"],
+        help="How n-grams are counted; numpy keeps them as integer ids and needs numpy installed.",
+    )
+    arg_parser.add_argument(
+        "--keyword-counters",
+        default=None,
+        type=int,
+        help="Keep at most this many site-wide counts each of words, bigrams and trigrams; the most frequent are kept and their counts may be slightly too high.",
+    )
+    arg_parser.add_argument(
+        "--keyword-sketch",
+        default=False,
+        action="store_true",
+        help="With --keyword-counters, use a count-min sketch to make the kept counts more accurate.",
+    )
+    arg_parser.add_argument(
+        "--keyword-scoring",
+        default=None,
+        choices=["tfidf", "bm25"],
+        help="Also rank keywords by TF-IDF or BM25 over all pages, so words found on every page rank low (needs numpy installed).",
+    )
+    arg_parser.add_argument(
+        "--top-keywords",
+        default=50,
+        type=int,
+        help="Number of scored keywords reported for the site and for every page.",
+    )
+    arg_parser.add_argument(
+        "--near-duplicates",
+        default=None,
+        type=float,
+        help="Report groups of pages whose text is at least this similar (0 to 1), e.g. 0.9.",
+    )
+
     args = arg_parser.parse_args()
 
+    http_client = Http(
+        pool_size=args.pool_size
+        or max(10, args.concurrency_per_host or args.concurrency),
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+        retries=args.retries,
+        backoff_factor=args.backoff_factor,
+    )
+
+    shard_address = None
+    if args.shard_listen:
+        host, _, port = args.shard_listen.rpartition(":")
+        shard_address = (host, int(port))
+
     output = analyze(
         args.site,
         args.sitemap,
         analyze_headings=args.analyze_headings,
         analyze_extra_tags=args.analyze_extra_tags,
         follow_links=args.no_follow_links,
+        concurrency=args.concurrency,
+        concurrency_per_host=args.concurrency_per_host,
+        analyze_workers=args.analyze_workers,
+        queue_size=args.queue_size,
+        resume=args.resume,
+        http_cache=args.http_cache,
+        result_store=args.result_store,
+        delay=args.delay,
+        max_pages=args.max_pages,
+        max_depth=args.max_depth,
+        deadline=args.deadline,
+        shards=args.shards,
+        shard_address=shard_address,
+        shard_authkey=(
+            args.shard_authkey.encode("utf-8") if args.shard_authkey else None
+        ),
+        respect_robots=not args.ignore_robots,
+        http_client=http_client,
+        stream_threshold=args.stream_threshold,
+        rules=args.rules,
+        disabled_rules=args.disabled_rules,
+        stem_table=args.stem_table,
+        text_engine=args.text_engine,
+        keyword_counters=args.keyword_counters,
+        keyword_sketch=args.keyword_sketch,
+        keyword_scoring=args.keyword_scoring,
+        top_keywords=args.top_keywords,
+        near_duplicates=args.near_duplicates,
     )
 
     if args.output_format == "html":
@@ -1,5 +1,9 @@
 import time
 from operator import itemgetter
+from .http import Http
+from .http import HttpCache
+from .ngrams import NgramTable
+from .page import STREAM_THRESHOLD
 from .website import Website
 
 def calc_total_time(start_time):
@@ -11,6 +15,32 @@ def analyze(
     analyze_headings=False,
     analyze_extra_tags=False,
     follow_links=True,
+    concurrency=1,
+    concurrency_per_host=None,
+    analyze_workers=0,
+    queue_size=None,
+    resume=None,
+    http_cache=None,
+    result_store=None,
+    delay=0.0,
+    max_pages=None,
+    max_depth=None,
+    deadline=None,
+    shards=0,
+    shard_address=None,
+    shard_authkey=None,
+    respect_robots=True,
+    http_client=None,
+    stream_threshold=STREAM_THRESHOLD,
+    rules=None,
+    disabled_rules=(),
+    stem_table=None,
+    text_engine="python",
+    keyword_counters=None,
+    keyword_sketch=False,
+    keyword_scoring=None,
+    top_keywords=50,
+    near_duplicates=None,
 ):
     start_time = time.time()
 
@@ -21,12 +51,42 @@ def analyze(
         "total_time": 0,  # Initialize to 0 before calculation
     }
 
+    if http_client is None:
+        http_client = Http(pool_size=max(10, concurrency_per_host or concurrency))
+
+    if http_cache and http_client.cache is None:
+        http_client.cache = HttpCache(http_cache)
+
     site = Website(
         url,
         sitemap_url,
         analyze_headings,
         analyze_extra_tags,
         follow_links,
+        concurrency=concurrency,
+        concurrency_per_host=concurrency_per_host,
+        analyze_workers=analyze_workers,
+        queue_size=queue_size,
+        resume=resume,
+        http_client=http_client,
+        result_store=result_store,
+        delay=delay,
+        max_pages=max_pages,
+        max_depth=max_depth,
+        deadline=deadline,
+        shards=shards,
+        shard_address=shard_address,
+        shard_authkey=shard_authkey,
+        respect_robots=respect_robots,
+        stream_threshold=stream_threshold,
+        rules=rules,
+        disabled_rules=disabled_rules,
+        stem_table=stem_table,
+        text_engine=text_engine,
+        keyword_counters=keyword_counters,
+        keyword_sketch=keyword_sketch,
+        keyword_scoring=keyword_scoring,
+        near_duplicates=near_duplicates,
     )
 
     site.crawl()
@@ -34,50 +94,48 @@ def analyze(
     for p in site.crawled_pages:
         output["pages"].append(p.talk())
 
+    output["errors"].extend(site.errors)
+
     output["duplicate_pages"] = [
         list(site.content_hashes[p])
         for p in site.content_hashes
         if len(site.content_hashes[p]) > 1
     ]
 
-    sorted_words = sorted(site.wordcount.items(), key=itemgetter(1), reverse=True)
-    sorted_bigrams = sorted(site.bigrams.items(), key=itemgetter(1), reverse=True)
-    sorted_trigrams = sorted(site.trigrams.items(), key=itemgetter(1), reverse=True)
-
-    output["keywords"] = []
-
-    for w in sorted_words:
-        if w[1] > 4:
-            output["keywords"].append(
-                {
-                    "word": w[0],
-                    "count": w[1],
-                }
-            )
-
-    for w, v in sorted_bigrams:
-        if v > 4:
-            output["keywords"].append(
-                {
-                    "word": w,
-                    "count": v,
-                }
-            )
-
-    for w, v in sorted_trigrams:
-        if v > 4:
-            output["keywords"].append(
-                {
-                    "word": w,
-                    "count": v,
-                }
-            )
-
-    # Sort one last time...
+    if site.near_duplicate_index is not None:
+        output["near_duplicate_pages"] = site.near_duplicate_index.clusters()
+
+    bigrams = site.bigrams
+    trigrams = site.trigrams
+
+    if isinstance(bigrams, NgramTable):
+        # only the n-grams reported below are turned back into strings
+        bigrams = bigrams.above(4)
+        trigrams = trigrams.above(4)
+
+    # one stable sort keeps words before bigrams before trigrams on ties
     output["keywords"] = sorted(
-        output["keywords"], key=itemgetter("count"), reverse=True
+        (
+            {
+                "word": w,
+                "count": v,
+            }
+            for counts in (site.wordcount, bigrams, trigrams)
+            for w, v in counts.items()
+            if v > 4
+        ),
+        key=itemgetter("count"),
+        reverse=True,
     )
 
+    if site.keyword_index is not None:
+        output["keyword_scores"], page_scores = site.keyword_index.top(top_keywords)
+
+        for page in output["pages"]:
+            page["keyword_scores"] = page_scores.get(page["url"], [])
+
+    output["crawl_stats"] = site.stats()
+
     output["total_time"] = calc_total_time(start_time)
 
     return output
@@ -0,0 +1,189 @@
+import heapq
+import pickle
+import sqlite3
+
+from itertools import count
+
+from .frontier import Frontier
+from .frontier import normalize_url
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    priority INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    page BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_page INTEGER NOT NULL,
+    aggregates BLOB NOT NULL
+);
+"""
+
+
+class PersistentFrontier(Frontier):
+    """
+    A Frontier whose contents are mirrored into a CheckpointStore.
+
+    The queue and seen-set are still served from memory; new urls are only
+    written out together with the page that discovered them, so a url is
+    either queued on disk along with its parent page or not at all.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.unsaved = []
+
+    def enqueue(self, entry):
+        super().enqueue(entry)
+        priority, seq, url, depth = entry
+        self.unsaved.append((url, priority, seq, depth))
+
+    def restore(self, rows):
+        """
+        Loads ``(url, priority, seq, depth, done)`` rows written by an
+        earlier run
+        """
+
+        last_seq = -1
+
+        for url, priority, seq, depth, done in rows:
+            self.seen.add(url)
+            last_seq = max(last_seq, seq)
+
+            if not done:
+                self.queue.append((priority, seq, url, depth))
+
+        heapq.heapify(self.queue)
+        self.counter = count(last_seq + 1)
+
+
+class CheckpointStore:
+    """
+    SQLite backed store that lets a crawl pick up where it stopped.
+
+    Every analyzed page is written in one transaction together with the urls
+    it added to the frontier and its frontier row being marked done, so after
+    a crash nothing that was saved is fetched again. The site-wide
+    aggregates are snapshotted every ``snapshot_interval`` pages; on resume
+    the snapshot is loaded and only the pages saved after it are merged
+    again.
+    """
+
+    def __init__(self, path, snapshot_interval=500):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.frontier = PersistentFrontier()
+        self.unsnapshotted = 0
+        self.last_page = 0
+
+    def resumable(self):
+        """
+        True if an earlier run left state behind in this store
+        """
+
+        row = self.connection.execute("SELECT COUNT(*) FROM frontier").fetchone()
+
+        return row[0] > 0
+
+    def load(self):
+        """
+        Restores the frontier and returns ``(pages, aggregates, newer_pages)``
+        where ``aggregates`` is the last snapshot (or None) and
+        ``newer_pages`` are the pages that were saved after it.
+        """
+
+        self.frontier.restore(
+            self.connection.execute(
+                "SELECT url, priority, seq, depth, done FROM frontier"
+            )
+        )
+
+        aggregates = None
+        snapshot_page = 0
+        row = self.connection.execute(
+            "SELECT last_page, aggregates FROM snapshots WHERE id = 1"
+        ).fetchone()
+
+        if row is not None:
+            snapshot_page = row[0]
+            aggregates = pickle.loads(row[1])
+
+        pages = []
+        newer_pages = []
+
+        for page_id, blob in self.connection.execute(
+            "SELECT id, page FROM pages ORDER BY id"
+        ):
+            page = pickle.loads(blob)
+            pages.append(page)
+            self.last_page = page_id
+
+            if page_id > snapshot_page:
+                newer_pages.append(page)
+
+        return pages, aggregates, newer_pages
+
+    def flush(self):
+        """
+        Writes out urls pushed since the last save
+        """
+
+        with self.connection:
+            self.write_frontier()
+
+    def write_frontier(self):
+        if self.frontier.unsaved:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO frontier (url, priority, seq, depth) VALUES (?, ?, ?, ?)",
+                self.frontier.unsaved,
+            )
+            self.frontier.unsaved = []
+
+    def save_page(self, page, aggregates):
+        """
+        Records an analyzed page, the urls it discovered and, every
+        ``snapshot_interval`` pages, a snapshot of the aggregates
+        """
+
+        with self.connection:
+            self.write_frontier()
+            cursor = self.connection.execute(
+                "INSERT INTO pages (url, page) VALUES (?, ?)",
+                (page.url, pickle.dumps(page, pickle.HIGHEST_PROTOCOL)),
+            )
+            self.last_page = cursor.lastrowid
+            self.connection.execute(
+                "UPDATE frontier SET done = 1 WHERE url = ?",
+                (normalize_url(page.url),),
+            )
+
+            self.unsnapshotted += 1
+            if self.unsnapshotted >= self.snapshot_interval:
+                self.write_snapshot(aggregates)
+
+    def snapshot(self, aggregates):
+        with self.connection:
+            self.write_frontier()
+            self.write_snapshot(aggregates)
+
+    def write_snapshot(self, aggregates):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO snapshots (id, last_page, aggregates) VALUES (1, ?, ?)",
+            (self.last_page, pickle.dumps(aggregates, pickle.HIGHEST_PROTOCOL)),
+        )
+        self.unsnapshotted = 0
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,257 @@
+import hashlib
+
+from array import array
+from operator import eq
+
+# Slots of a page fingerprint; two fingerprints agree on about as many
+# slots as the pages share shingles
+NUM_HASHES = 64
+
+# Words per shingle
+SHINGLE_SIZE = 5
+
+_MASK = (1 << 32) - 1
+# added per slot skipped when an empty slot borrows from its neighbour
+_ROTATION = 0x9E3779B1
+
+
+def shingle_hashes(tokens, size=SHINGLE_SIZE):
+    """
+    Returns the stable 64-bit hashes of the distinct runs of ``size`` words
+    in a list of tokens. A page shorter than that is a single shingle.
+    """
+
+    if len(tokens) < size:
+        shingles = [tokens] if tokens else []
+    else:
+        shingles = zip(*(tokens[i:] for i in range(size)))
+
+    return {
+        int.from_bytes(
+            hashlib.blake2b(" ".join(shingle).encode("utf-8"), digest_size=8).digest(),
+            "little",
+        )
+        for shingle in shingles
+    }
+
+
+class MinHash:
+    """
+    Builds the MinHash fingerprint of a page from its tokens as they come.
+    Only the smallest hash of every slot and the last few tokens are kept,
+    so shingles run across the batches of tokens it is given.
+
+    One hash per shingle is enough (one permutation hashing): its high bits
+    pick the slot, its low 32 bits compete for the minimum of that slot.
+    """
+
+    def __init__(self, num_hashes=NUM_HASHES, size=SHINGLE_SIZE):
+        self.num_hashes = num_hashes
+        self.size = size
+        self.slots = [None] * num_hashes
+        # the tokens the next shingles start with
+        self.tail = []
+        self.shingled = False
+
+    def update(self, tokens):
+        run = self.tail + list(tokens)
+
+        if len(run) >= self.size:
+            self.add(shingle_hashes(run, self.size))
+            self.shingled = True
+
+        self.tail = run[1 - self.size :] if self.size > 1 else []
+
+    def add(self, hashes):
+        slots = self.slots
+        num_hashes = self.num_hashes
+
+        for h in hashes:
+            slot = (h >> 32) * num_hashes >> 32
+            value = h & _MASK
+
+            if slots[slot] is None or value < slots[slot]:
+                slots[slot] = value
+
+    def signature(self):
+        """
+        Returns the fingerprint, or None if there were no tokens. Empty
+        slots take the value of the next filled one.
+        """
+
+        if not self.shingled:
+            if not self.tail:
+                return None
+
+            # a page shorter than a shingle is a single shingle
+            self.add(shingle_hashes(self.tail, self.size))
+
+        num_hashes = self.num_hashes
+        slots = self.slots
+        signature = array("I", bytes(4 * num_hashes))
+
+        for slot in range(num_hashes):
+            distance = 0
+
+            while slots[(slot + distance) % num_hashes] is None:
+                distance += 1
+
+            value = slots[(slot + distance) % num_hashes]
+            signature[slot] = (value + distance * _ROTATION) & _MASK
+
+        return signature
+
+
+def minhash(tokens, num_hashes=NUM_HASHES):
+    """
+    Returns the MinHash fingerprint of a page's tokens, or None if it has
+    none
+    """
+
+    fingerprint = MinHash(num_hashes)
+    fingerprint.update(tokens)
+
+    return fingerprint.signature()
+
+
+def lsh_bands(threshold, num_hashes=NUM_HASHES):
+    """
+    Returns the (bands, rows) split of a fingerprint that best separates
+    pages above the similarity threshold from those below it. Candidates
+    are checked afterwards, so a missed pair costs more than a false one.
+    """
+
+    def integrate(f, low, high, steps=100):
+        width = (high - low) / steps
+        return sum(f(low + (i + 0.5) * width) for i in range(steps)) * width
+
+    best = None
+
+    for rows in range(1, num_hashes + 1):
+        bands = num_hashes // rows
+        false_positives = integrate(
+            lambda s: 1 - (1 - s**rows) ** bands, 0.0, threshold
+        )
+        false_negatives = integrate(lambda s: (1 - s**rows) ** bands, threshold, 1.0)
+        error = false_positives + 4 * false_negatives
+
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """
+    Groups pages whose fingerprints agree on at least ``threshold`` of
+    their slots, without comparing every pair of pages. Every band of a
+    fingerprint is a bucket key (locality sensitive hashing). A new page is
+    only compared with the pages that share one of its buckets. Matches are
+    joined into clusters with a union-find.
+
+    At most ``bucket_size`` pages are kept per bucket. A bucket that full
+    holds pages that are already clustered together, so a new page is still
+    found through them.
+    """
+
+    def __init__(self, threshold=0.9, num_hashes=NUM_HASHES, bucket_size=32):
+        self.threshold = threshold
+        self.num_hashes = num_hashes
+        self.bucket_size = bucket_size
+        self.bands, self.rows = lsh_bands(threshold, num_hashes)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.urls = []
+        self.parents = []
+        # the fingerprints of all pages, one after the other
+        self.signatures = array("I")
+        self.comparisons = 0
+        self.matches = 0
+
+    def signature(self, page):
+        start = page * self.num_hashes
+
+        return self.signatures[start : start + self.num_hashes]
+
+    def similarity(self, page, other):
+        agreeing = sum(map(eq, self.signature(page), self.signature(other)))
+
+        return agreeing / self.num_hashes
+
+    def find(self, page):
+        parents = self.parents
+        root = page
+
+        while parents[root] != root:
+            root = parents[root]
+
+        while parents[page] != root:
+            parents[page], page = root, parents[page]
+
+        return root
+
+    def add(self, url, signature):
+        """
+        Adds the fingerprint of a page and joins it to the clusters of the
+        pages it is similar to
+        """
+
+        page = len(self.urls)
+        self.urls.append(url)
+        self.parents.append(page)
+        self.signatures.extend(signature)
+        checked = set()
+
+        for band, bucket in enumerate(self.buckets):
+            start = band * self.rows
+            key = hashlib.blake2b(
+                signature[start : start + self.rows].tobytes(), digest_size=8
+            ).digest()
+            members = bucket.get(key)
+
+            # most buckets only ever hold one page
+            if members is None:
+                bucket[key] = page
+                continue
+
+            if isinstance(members, int):
+                members = bucket[key] = [members]
+
+            for other in members:
+                if other in checked:
+                    continue
+
+                checked.add(other)
+
+                if self.find(other) == self.find(page):
+                    continue
+
+                self.comparisons += 1
+
+                if self.similarity(page, other) >= self.threshold:
+                    self.matches += 1
+                    self.parents[self.find(page)] = self.find(other)
+
+            if len(members) < self.bucket_size:
+                members.append(page)
+
+    def clusters(self):
+        """
+        Returns the urls of every group of near duplicates, in the order
+        they were added
+        """
+
+        groups = {}
+
+        for page, url in enumerate(self.urls):
+            groups.setdefault(self.find(page), []).append(url)
+
+        return [urls for urls in groups.values() if len(urls) > 1]
+
+    def stats(self):
+        return {
+            "pages": len(self.urls),
+            "bands": self.bands,
+            "rows": self.rows,
+            "comparisons": self.comparisons,
+            "matches": self.matches,
+        }
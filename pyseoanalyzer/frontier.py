@@ -0,0 +1,122 @@
+import heapq
+
+from itertools import count
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+DEFAULT_PORTS = {
+    "http": 80,
+    "https": 443,
+}
+
+
+def normalize_url(url):
+    """
+    Returns the canonical form of a url so that trivially different
+    spellings of the same page compare equal.
+
+    The scheme and host are lowercased, default ports are dropped, an empty
+    path becomes ``/``, query parameters are sorted and the fragment is
+    removed. Paths are otherwise left alone, since ``/a`` and ``/a/`` may be
+    different pages.
+    """
+
+    url = url.strip()
+    parts = urlsplit(url)
+
+    if not parts.scheme or not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    userinfo, _, hostport = parts.netloc.rpartition("@")
+    host, port = hostport, ""
+
+    if not hostport.endswith("]") and ":" in hostport:
+        host, _, port = hostport.rpartition(":")
+
+    netloc = host.lower()
+
+    if port and port != str(DEFAULT_PORTS.get(scheme)):
+        netloc = f"{netloc}:{port}"
+
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+
+    path = parts.path or "/"
+
+    query = parts.query
+    if query:
+        query = "&".join(sorted(query.split("&")))
+
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class Frontier:
+    """
+    The queue of urls waiting to be crawled.
+
+    Urls are normalized and checked against everything ever queued when they
+    are pushed, so each page is only queued once no matter how many pages
+    link to it. Urls come out lowest priority first, and in the order they
+    were pushed within a priority, together with their link depth from the
+    start of the crawl.
+    """
+
+    def __init__(self):
+        self.queue = []
+        self.seen = set()
+        self.counter = count()
+        self.duplicates = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __contains__(self, url):
+        return normalize_url(url) in self.seen
+
+    def push(self, url, priority=0, depth=0):
+        """
+        Queues the url unless it has been seen before, returns True if it was
+        queued
+        """
+
+        url = normalize_url(url)
+
+        if url in self.seen:
+            self.duplicates += 1
+            return False
+
+        self.seen.add(url)
+        self.enqueue((priority, next(self.counter), url, depth))
+
+        return True
+
+    def mark_seen(self, url):
+        """
+        Records a url as seen without queueing it
+        """
+
+        self.seen.add(normalize_url(url))
+
+    def enqueue(self, entry):
+        heapq.heappush(self.queue, entry)
+
+    def extend(self, urls, priority=0, depth=0):
+        for url in urls:
+            self.push(url, priority, depth)
+
+    def pop(self):
+        """
+        Returns the next ``(url, depth)`` to crawl
+        """
+
+        entry = heapq.heappop(self.queue)
+
+        return entry[2], entry[3]
+
+    def stats(self):
+        return {
+            "frontier_size": len(self.queue),
+            "seen_urls": len(self.seen),
+            "duplicate_urls": self.duplicates,
+        }
@@ -1,21 +1,647 @@
 import certifi
+import json
+import socket
+import sqlite3
+import threading
+import time
+
+from urllib.parse import urljoin
+from urllib3 import HTTPConnectionPool
+from urllib3 import HTTPHeaderDict
+from urllib3 import HTTPSConnectionPool
 from urllib3 import PoolManager
+from urllib3 import Retry
 from urllib3 import Timeout
+from urllib3.connection import HTTPConnection
+from urllib3.connection import HTTPSConnection
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.exceptions import HTTPError
+from urllib3.exceptions import NameResolutionError
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.request import ACCEPT_ENCODING
 
+from .resolver import resolver as default_resolver
+
+# Sent with every request, and matched against the groups of robots.txt
+USER_AGENT = "Mozilla/5.0 (compatible; python-seo-analyzer)"
+
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+class Response:
+    """
+    The parts of an HTTP response the analyzer uses
+    """
+
+    def __init__(
+        self,
+        status,
+        headers,
+        data,
+        url=None,
+        from_cache=False,
+        skipped=False,
+        truncated=False,
+        wire_bytes=0,
+        redirects=(),
+        chunks=None,
+    ):
+        self.status = status
+        self.headers = headers
+        self.data = data
+        self.url = url
+        self.from_cache = from_cache
+        self.skipped = skipped
+        self.truncated = truncated
+        self.wire_bytes = wire_bytes
+        self.redirects = list(redirects)
+        self.chunks = chunks
+
+
+def media_type(headers):
+    """
+    Returns the lowercased media type of a response, without parameters
+    """
+
+    return headers.get("content-type", "").split(";")[0].strip().lower()
+
+
+class HttpCache:
+    """
+    Persistent cache of response bodies and their validators.
+
+    Cached urls are revalidated with If-None-Match / If-Modified-Since and a
+    304 is answered from the stored body. Only responses that carry an ETag
+    or Last-Modified header are stored, since nothing else can be
+    revalidated. When the stored bodies exceed ``max_bytes`` the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(CACHE_SCHEMA)
+        self.size = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+    def validators(self, url):
+        """
+        Returns the conditional request headers for a cached url
+        """
+
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT etag, last_modified FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+        if row is None:
+            return {}
+
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+
+        return headers
+
+    def revalidated(self, url):
+        """
+        Returns the stored response for a url the server answered with a 304
+        """
+
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT headers, body FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self.connection.execute(
+                "UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url)
+            )
+            self.hits += 1
+            self.bytes_saved += len(row[1])
+
+        return Response(
+            200, HTTPHeaderDict(json.loads(row[0])), row[1], url, from_cache=True
+        )
+
+    def store(self, url, response):
+        """
+        Saves a full response if it can be revalidated later
+        """
+
+        with self.lock:
+            self.misses += 1
+
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+
+        if response.status != 200 or not (etag or last_modified):
+            return
+
+        body = response.data
+        headers = json.dumps(list(response.headers.items()))
+
+        if len(body) > self.max_bytes:
+            return
+
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT size FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is not None:
+                self.size -= row[0]
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, headers, body, etag, last_modified, len(body), time.time()),
+            )
+            self.size += len(body)
+
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        for url, size in self.connection.execute(
+            "SELECT url, size FROM responses ORDER BY last_used"
+        ).fetchall():
+            if self.size <= self.max_bytes:
+                break
+
+            self.connection.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes_saved": self.bytes_saved,
+            "size": self.size,
+        }
+
+
+class ResolvingHTTPConnection(HTTPConnection):
+    """
+    Connects to the addresses the shared Resolver has cached for the host
+    instead of resolving it again for every new connection. Like
+    socket.create_connection(), each address is tried in turn until one
+    accepts the connection.
+    """
+
+    resolver = None
+
+    def _new_conn(self):
+        host = self._dns_host
+
+        try:
+            addresses = self.resolver.addresses(host)
+        except socket.gaierror as e:
+            raise NameResolutionError(host, self, e) from e
+
+        try:
+            for i, address in enumerate(addresses):
+                self._dns_host = address
+
+                try:
+                    return super()._new_conn()
+                except (ConnectTimeoutError, NewConnectionError):
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+
+
+class ResolvingHTTPSConnection(ResolvingHTTPConnection, HTTPSConnection):
+    pass
+
+
+class ConnectionStats:
+    """
+    Counts how the pools of one Http client hand out connections
+    """
 
-class Http:
     def __init__(self):
-        user_agent = {"User-Agent": "Mozilla/5.0"}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.pool_full_waits = 0
+        self.discarded_connections = 0
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def report(self):
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": max(0, self.requests - self.new_connections),
+                "pool_full_waits": self.pool_full_waits,
+                "discarded_connections": self.discarded_connections,
+            }
+
+
+class CountingPool:
+    """
+    Connection pool mixin recording into ``connection_stats`` whether each
+    request got a pooled connection. A request finding every connection of
+    the pool in use counts as a pool-full wait; with ``block=False`` it gets
+    an extra connection instead of waiting, which is discarded afterwards.
+    """
+
+    connection_stats = None
+
+    def _get_conn(self, timeout=None):
+        if self.pool is not None and self.pool.empty():
+            self.connection_stats.count("pool_full_waits")
+
+        self.connection_stats.count("requests")
+
+        return super()._get_conn(timeout)
+
+    def _new_conn(self):
+        self.connection_stats.count("new_connections")
+
+        return super()._new_conn()
+
+    def _put_conn(self, conn):
+        if conn is not None and self.pool is not None and self.pool.full():
+            self.connection_stats.count("discarded_connections")
+
+        return super()._put_conn(conn)
+
+
+def pool_classes(resolver, connection_stats):
+    """
+    Returns PoolManager pool classes that count their connections and, if a
+    resolver is given, connect through it
+    """
+
+    classes = {}
+
+    for scheme, pool, connection in (
+        ("http", HTTPConnectionPool, ResolvingHTTPConnection),
+        ("https", HTTPSConnectionPool, ResolvingHTTPSConnection),
+    ):
+        attrs = {"connection_stats": connection_stats}
+
+        if resolver is not None:
+            attrs["ConnectionCls"] = type(
+                connection.__name__[len("Resolving") :],
+                (connection,),
+                {"resolver": resolver},
+            )
+
+        classes[scheme] = type(pool.__name__, (CountingPool, pool), attrs)
+
+    return classes
+
+
+class Http:
+    """
+    The HTTP client used for every request of a crawl.
+
+    Bodies are always streamed. ``get`` can be given the media types the
+    caller is able to use, and a response of any other type is closed as
+    soon as its headers arrive instead of being downloaded. Bodies are read
+    up to ``max_size`` bytes, anything beyond that is cut off. Bodies handed
+    out as chunks while they download are cut off at ``max_stream_size``.
+
+    Up to ``num_pools`` hosts keep a pool of ``pool_size`` connections each.
+    With ``block`` set a request waits for a free connection of its host
+    instead of opening an extra one. Failed requests are retried up to
+    ``retries`` times, sleeping ``backoff_factor * 2 ** (retry - 1)``
+    seconds between attempts.
+    """
+
+    def __init__(
+        self,
+        cache=None,
+        resolver=default_resolver,
+        max_size=10 * 1024 * 1024,
+        max_stream_size=100 * 1024 * 1024,
+        chunk_size=64 * 1024,
+        pool_size=10,
+        num_pools=10,
+        block=False,
+        connect_timeout=1.0,
+        read_timeout=2.0,
+        retries=3,
+        backoff_factor=0.0,
+    ):
+        # ACCEPT_ENCODING lists every codec urllib3 can decode here, brotli
+        # and zstd included when their packages are installed
+        default_headers = {
+            "User-Agent": USER_AGENT,
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
 
         self.http = PoolManager(
-            timeout=Timeout(connect=1.0, read=2.0),
+            num_pools=num_pools,
+            maxsize=pool_size,
+            block=block,
+            timeout=Timeout(connect=connect_timeout, read=read_timeout),
             cert_reqs="CERT_REQUIRED",
             ca_certs=certifi.where(),
-            headers=user_agent,
+            headers=default_headers,
+            # Retry-After is honoured by the HostScheduler, which pauses the
+            # whole host instead of sleeping inside a single request
+            retries=Retry(
+                retries,
+                backoff_factor=backoff_factor,
+                respect_retry_after_header=False,
+            ),
+        )
+        # what another process needs to build a client configured like this
+        self.options = {
+            "max_size": max_size,
+            "max_stream_size": max_stream_size,
+            "chunk_size": chunk_size,
+            "pool_size": pool_size,
+            "num_pools": num_pools,
+            "block": block,
+            "connect_timeout": connect_timeout,
+            "read_timeout": read_timeout,
+            "retries": retries,
+            "backoff_factor": backoff_factor,
+        }
+        self.cache = cache
+        self.resolver = resolver
+        self.max_size = max_size
+        self.max_stream_size = max_stream_size
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.bytes_downloaded = 0
+        self.wire_bytes = 0
+        self.bytes_skipped = 0
+        self.skipped_responses = 0
+        self.truncated_responses = 0
+        self.streamed_responses = 0
+        self.connection_stats = ConnectionStats()
+        self.http.pool_classes_by_scheme = pool_classes(resolver, self.connection_stats)
+
+    def read(self, url, response, content_types=None, stream_above=None):
+        """
+        Reads a streamed response into a Response, skipping bodies of an
+        unwanted media type and cutting off bodies larger than max_size.
+
+        Once more than ``stream_above`` bytes have been read the body is not
+        collected any more: the Response gets no ``data`` and its ``chunks``
+        yield the body as it downloads instead, up to max_stream_size bytes.
+        """
+
+        length = response.headers.get("content-length")
+        length = int(length) if length and length.isdigit() else None
+
+        if content_types is not None and media_type(response.headers) not in (
+            "",
+            *content_types,
+        ):
+            response.close()
+            response.release_conn()
+            return self.result(url, response, b"", length, skipped=True)
+
+        body = response.stream(self.chunk_size)
+        chunks = []
+        size = 0
+        truncated = False
+        streaming = False
+
+        try:
+            for chunk in body:
+                chunks.append(chunk)
+                size += len(chunk)
+
+                if stream_above is not None and size > stream_above:
+                    streaming = True
+                    break
+
+                if size >= self.max_size:
+                    # Content-Length counts the bytes on the wire, which
+                    # differ from the decoded size of a compressed body
+                    truncated = (
+                        size > self.max_size
+                        or length is None
+                        or response.tell() < length
+                    )
+                    break
+        finally:
+            if not streaming:
+                if truncated:
+                    response.close()
+                response.release_conn()
+
+        if streaming:
+            result = self.result(url, response, None, length)
+            result.chunks = self.read_rest(result, response, chunks, body, length)
+            return result
+
+        # a single join, so a large body is copied once at most
+        data = b"".join(chunks)[: self.max_size]
+
+        return self.result(url, response, data, length, truncated=truncated)
+
+    def read_rest(self, result, response, chunks, body, length):
+        """
+        Yields the chunks read so far, then the rest of a body as it arrives.
+        A body larger than max_stream_size is cut off there and the result
+        marked truncated.
+        """
+
+        def drain():
+            chunks.reverse()
+
+            while chunks:
+                yield chunks.pop()
+
+            yield from body
+
+        size = 0
+        complete = False
+
+        try:
+            for chunk in drain():
+                size += len(chunk)
+
+                if size >= self.max_stream_size:
+                    # compared on the decoded size like read() does
+                    result.truncated = (
+                        size > self.max_stream_size
+                        or length is None
+                        or response.tell() < length
+                    )
+                    chunk = chunk[: len(chunk) - (size - self.max_stream_size)]
+                    size = self.max_stream_size
+
+                    if chunk:
+                        yield chunk
+                    break
+
+                yield chunk
+
+            complete = not result.truncated
+        finally:
+            if not complete:
+                response.close()
+            response.release_conn()
+
+            result.wire_bytes = response.tell()
+
+            with self.lock:
+                self.bytes_downloaded += size
+                self.wire_bytes += result.wire_bytes
+
+                if result.truncated:
+                    self.truncated_responses += 1
+
+                    if length is not None:
+                        self.bytes_skipped += max(0, length - result.wire_bytes)
+
+    def result(self, url, response, data, length, skipped=False, truncated=False):
+        """
+        Records the transfer of a response and wraps it in a Response
+        """
+
+        # tell() counts the bytes read off the connection, before decoding
+        wire_bytes = response.tell()
+        redirects = []
+
+        if response.retries is not None:
+            redirects = [
+                (hop.url, hop.status, urljoin(hop.url, hop.redirect_location))
+                for hop in response.retries.history
+                if hop.redirect_location
+            ]
+
+        with self.lock:
+            if data is None:
+                self.streamed_responses += 1
+            else:
+                self.bytes_downloaded += len(data)
+                self.wire_bytes += wire_bytes
+
+            if skipped:
+                self.skipped_responses += 1
+            if truncated:
+                self.truncated_responses += 1
+            if (skipped or truncated) and length is not None:
+                self.bytes_skipped += max(0, length - wire_bytes)
+
+        return Response(
+            response.status,
+            response.headers,
+            data,
+            response.geturl() or url,
+            skipped=skipped,
+            truncated=truncated,
+            wire_bytes=wire_bytes,
+            redirects=redirects,
         )
 
-    def get(self, url):
-        return self.http.request("GET", url)
+    def get(self, url, content_types=None, stream_above=None):
+        """
+        Fetches a url. With ``content_types`` set, only responses of those
+        media types (or without a Content-Type) have their body read. See
+        read() for ``stream_above``.
+        """
+
+        if self.cache is None:
+            response = self.http.request("GET", url, preload_content=False)
+            return self.read(url, response, content_types, stream_above)
+
+        headers = dict(self.http.headers)
+        headers.update(self.cache.validators(url))
+
+        response = self.http.request("GET", url, headers=headers, preload_content=False)
+
+        if response.status == 304:
+            response.release_conn()
+            cached = self.cache.revalidated(url)
+            if cached is not None:
+                return cached
+
+        result = self.read(url, response, content_types, stream_above)
+
+        if result.data is not None and not (result.skipped or result.truncated):
+            self.cache.store(url, result)
+
+        return result
+
+    def stream(self, url, chunk_size=64 * 1024):
+        """
+        Yields the body of a successful response in chunks, without holding
+        all of it in memory
+        """
+
+        response = self.http.request("GET", url, preload_content=False)
+        complete = False
+
+        try:
+            if response.status != 200:
+                raise HTTPError(f"{url} returned {response.status}")
+
+            yield from response.stream(chunk_size)
+            complete = True
+        finally:
+            if not complete:
+                response.close()
+            response.release_conn()
+
+    def stats(self):
+        """
+        Returns counters describing the requests made so far
+        """
+
+        with self.lock:
+            stats = {
+                "transfer": {
+                    "bytes_downloaded": self.bytes_downloaded,
+                    "wire_bytes": self.wire_bytes,
+                    "compression_ratio": (
+                        self.bytes_downloaded / self.wire_bytes
+                        if self.wire_bytes
+                        else None
+                    ),
+                    "bytes_skipped": self.bytes_skipped,
+                    "skipped_responses": self.skipped_responses,
+                    "truncated_responses": self.truncated_responses,
+                    "streamed_responses": self.streamed_responses,
+                },
+                "connections": self.connection_stats.report(),
+            }
+
+        if self.cache is not None:
+            stats["http_cache"] = self.cache.stats()
+        if self.resolver is not None:
+            stats["dns"] = self.resolver.stats()
+
+        return stats
 
 
 http = Http()
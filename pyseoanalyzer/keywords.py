@@ -0,0 +1,144 @@
+from .ngrams import Vocabulary
+from .ngrams import materialize
+from .ngrams import np
+
+SCORINGS = ("tfidf", "bm25")
+
+
+def top_n(values, n):
+    """
+    Returns the indexes of the ``n`` largest values, largest first. Only
+    those n are sorted, the rest is split off with a partial selection.
+    """
+
+    if len(values) > n:
+        candidates = np.argpartition(values, len(values) - n)[-n:]
+    else:
+        candidates = np.arange(len(values))
+
+    return candidates[np.argsort(-values[candidates], kind="stable")]
+
+
+class KeywordIndex:
+    """
+    Sparse page x term matrix of the word, bigram and trigram counts of
+    every page, filled while the site is crawled and scored with TF-IDF or
+    BM25 once it is done. Terms appearing on nearly every page, like
+    navigation and footers, score low however often they occur.
+
+    The matrix is kept in CSR form: the terms of page i are
+    ``indices[indptr[i]:indptr[i + 1]]``, their counts are in ``counts``.
+    """
+
+    def __init__(self, scoring="bm25", k1=1.2, b=0.75):
+        if scoring not in SCORINGS:
+            raise ValueError(f"Unknown keyword scoring: {scoring}")
+
+        if np is None:
+            raise ImportError("Keyword scoring needs numpy to be installed")
+
+        self.scoring = scoring
+        self.k1 = k1
+        self.b = b
+        self.vocabulary = Vocabulary()
+        self.urls = []
+        self.lengths = []
+        self.indptr = [0]
+        # one (indices, counts) pair per page until matrix() joins them
+        self.chunks = []
+
+    def add(self, page):
+        """
+        Adds a row for an analyzed page
+        """
+
+        terms = dict(page.wordcount)
+        terms.update(materialize(page.bigrams))
+        terms.update(materialize(page.trigrams))
+
+        self.chunks.append(
+            (
+                self.vocabulary.ids(list(terms)),
+                np.fromiter(terms.values(), np.int64, len(terms)),
+            )
+        )
+        self.urls.append(page.url)
+        self.lengths.append(page.total_word_count)
+        self.indptr.append(self.indptr[-1] + len(terms))
+
+    def matrix(self):
+        """
+        Returns the ``indices`` and ``counts`` arrays of the matrix
+        """
+
+        if len(self.chunks) != 1:
+            indices = [chunk[0] for chunk in self.chunks]
+            counts = [chunk[1] for chunk in self.chunks]
+            self.chunks = [
+                (
+                    np.concatenate(indices or [np.empty(0, np.uint32)]),
+                    np.concatenate(counts or [np.empty(0, np.int64)]),
+                )
+            ]
+
+        return self.chunks[0]
+
+    def scores(self):
+        """
+        Returns the score of every nonzero cell of the matrix
+        """
+
+        indices, counts = self.matrix()
+        pages = len(self.urls)
+        df = np.bincount(indices, minlength=len(self.vocabulary.tokens))
+        tf = counts.astype(np.float64)
+        page_lengths = np.maximum(np.array(self.lengths, dtype=np.float64), 1)
+        # the length of the page of every cell
+        lengths = np.repeat(page_lengths, np.diff(self.indptr))
+
+        if self.scoring == "bm25":
+            idf = np.log1p((pages - df + 0.5) / (df + 0.5))
+            average = page_lengths.mean() if pages else 1.0
+            norm = self.k1 * (1 - self.b + self.b * lengths / average)
+
+            return idf[indices] * tf * (self.k1 + 1) / (tf + norm)
+
+        # terms on every page score 0
+        idf = np.log(pages / np.maximum(df, 1))
+
+        return idf[indices] * tf / lengths
+
+    def top(self, n):
+        """
+        Returns the ``n`` best keywords of the site, scored by the sum of
+        their page scores, and the ``n`` best of every page by url
+        """
+
+        indices, counts = self.matrix()
+        scores = self.scores()
+        tokens = self.vocabulary.tokens
+        size = len(tokens)
+
+        site_scores = np.bincount(indices, weights=scores, minlength=size)
+        site_counts = np.bincount(indices, weights=counts, minlength=size)
+        site = [
+            {
+                "word": tokens[i],
+                "count": int(site_counts[i]),
+                "score": float(site_scores[i]),
+            }
+            for i in top_n(site_scores, n).tolist()
+        ]
+
+        pages = {}
+
+        for row, url in enumerate(self.urls):
+            start, end = self.indptr[row], self.indptr[row + 1]
+            page_scores = scores[start:end]
+            page_terms = indices[start:end]
+            pages[url] = [
+                {"word": tokens[page_terms[i]], "score": float(page_scores[i])}
+                for i in top_n(page_scores, n).tolist()
+            ]
+
+        return site, pages
@@ -0,0 +1,229 @@
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # only the numpy text engine needs it
+    np = None
+
+TEXT_ENGINES = ("python", "numpy")
+
+# Rows added to a site-wide table are folded into it once this many pile up
+COMPACT_ROWS = 1 << 20
+
+
+def check_text_engine(text_engine):
+    if text_engine not in TEXT_ENGINES:
+        raise ValueError(f"Unknown text engine: {text_engine}")
+
+    if text_engine == "numpy" and np is None:
+        raise ImportError("The numpy text engine needs numpy to be installed")
+
+
+class TokenIds:
+    """
+    The tokens of a page as an array of indexes into its distinct tokens,
+    built from batches of tokens so the tokens themselves need not be kept
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.ids = array("I")
+
+    def add(self, tokens):
+        index = self.index
+        self.ids.extend(index.setdefault(token, len(index)) for token in tokens)
+
+    def arrays(self):
+        """
+        Returns the distinct tokens in order of first appearance, and the
+        array of indexes into them
+        """
+
+        return list(self.index), np.frombuffer(self.ids, np.uint32)
+
+
+def first_occurrences(columns, weights=None):
+    """
+    Groups the equal rows of ``columns``, a list of equally long id arrays
+    holding one word of the n-grams each. Returns where every distinct row
+    first occurs, in order of first occurrence, and how often it occurs (or
+    the sum of its ``weights``).
+
+    Rows are packed into a single uint64 whenever their ids fit, otherwise
+    they are sorted column by column.
+    """
+
+    size = len(columns[0])
+
+    if size == 0:
+        return np.empty(0, np.intp), np.empty(0, np.int64)
+
+    bits = max(1, int(max(column.max() for column in columns)).bit_length())
+
+    if bits * len(columns) <= 64:
+        keys = columns[0].astype(np.uint64)
+
+        for column in columns[1:]:
+            keys <<= np.uint64(bits)
+            keys |= column
+
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights, len(unique))
+    else:
+        # lexsort is stable, so each group starts with its first occurrence
+        order = np.lexsort(columns[::-1])
+        ordered = [column[order] for column in columns]
+        starts = np.ones(size, dtype=bool)
+        starts[1:] = np.any([c[1:] != c[:-1] for c in ordered], axis=0)
+        starts = np.flatnonzero(starts)
+        first = order[starts]
+
+        if weights is None:
+            counts = np.diff(np.append(starts, size))
+        else:
+            counts = np.add.reduceat(weights[order], starts)
+
+    by_position = np.argsort(first, kind="stable")
+
+    return first[by_position], counts[by_position].astype(np.int64)
+
+
+class TokenCounts:
+    """
+    The n-gram counts of one page. ``rows`` holds an array per word of the
+    n-grams, of indexes into the page's distinct ``tokens``.
+    """
+
+    def __init__(self, tokens, rows, counts):
+        self.tokens = tokens
+        self.rows = rows
+        self.counts = counts
+
+    @classmethod
+    def count(cls, tokens, ids, n):
+        """
+        Counts the n-grams of a page given as returned by
+        TokenIds.arrays()
+        """
+
+        size = max(0, len(ids) - n + 1)
+        columns = [ids[k : k + size] for k in range(n)]
+        first, counts = first_occurrences(columns)
+
+        return cls(tokens, [column[first] for column in columns], counts)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def counter(self):
+        """
+        Returns the counts keyed by the n-grams themselves, like the python
+        text engine counts them
+        """
+
+        tokens = self.tokens
+        words = [[tokens[i] for i in row.tolist()] for row in self.rows]
+
+        return Counter(dict(zip(map(" ".join, zip(*words)), self.counts.tolist())))
+
+
+def materialize(counts):
+    """
+    Returns n-gram counts of either text engine as a Counter of strings
+    """
+
+    if isinstance(counts, TokenCounts):
+        return counts.counter()
+
+    return counts
+
+
+class Vocabulary:
+    """
+    Gives every token seen on the site an integer id
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.tokens = []
+
+    def ids(self, tokens):
+        index = self.index
+
+        for token in tokens:
+            if token not in index:
+                index[token] = len(self.tokens)
+                self.tokens.append(token)
+
+        return np.fromiter(map(index.__getitem__, tokens), np.uint32, len(tokens))
+
+
+class NgramTable:
+    """
+    Site-wide n-gram counts kept as arrays of ids into a Vocabulary shared
+    with the other tables. Pages are folded in in batches, and strings are
+    only built for the n-grams asked for with above().
+    """
+
+    def __init__(self, n, vocabulary):
+        self.n = n
+        self.vocabulary = vocabulary
+        self.rows = [np.empty(0, np.uint32) for _ in range(n)]
+        self.counts = np.empty(0, np.int64)
+        self.pending = []
+        self.pending_rows = 0
+
+    def add(self, page_counts):
+        """
+        Adds the TokenCounts of a page
+        """
+
+        if not len(page_counts):
+            return
+
+        ids = self.vocabulary.ids(page_counts.tokens)
+        self.pending.append(
+            ([ids[row] for row in page_counts.rows], page_counts.counts)
+        )
+        self.pending_rows += len(page_counts)
+
+        if self.pending_rows >= COMPACT_ROWS:
+            self.compact()
+
+    def compact(self):
+        """
+        Folds the pages added since the last call into the table
+        """
+
+        if not self.pending:
+            return
+
+        columns = [
+            np.concatenate([self.rows[k]] + [rows[k] for rows, _ in self.pending])
+            for k in range(self.n)
+        ]
+        weights = np.concatenate([self.counts] + [counts for _, counts in self.pending])
+
+        first, self.counts = first_occurrences(columns, weights)
+        self.rows = [column[first] for column in columns]
+        self.pending = []
+        self.pending_rows = 0
+
+    def above(self, threshold):
+        """
+        Returns the n-grams counted more than ``threshold`` times, as a dict
+        of strings in order of first appearance
+        """
+
+        self.compact()
+        keep = np.flatnonzero(self.counts > threshold)
+        tokens = self.vocabulary.tokens
+        words = [[tokens[i] for i in row[keep].tolist()] for row in self.rows]
+
+        return dict(zip(map(" ".join, zip(*words)), self.counts[keep].tolist()))
+
+    def __len__(self):
+        self.compact()
+
+        return len(self.counts)
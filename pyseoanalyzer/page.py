@@ -2,15 +2,22 @@ import hashlib
 import lxml.html as lh
 import os
 import re
+import threading
 
-from bs4 import BeautifulSoup
 from collections import Counter
+from lxml import etree
 from string import punctuation
 from urllib.parse import urlsplit
 from urllib3.exceptions import HTTPError
 
+from .duplicates import MinHash
 from .http import http
-from .stemmer import stem
+from .http import media_type
+from .ngrams import TokenCounts
+from .ngrams import TokenIds
+from .ngrams import materialize
+from .rules import compile_rules
+from .stemmer import stem_many
 
 # This list of English stop words is taken from the "Glasgow Information
 # Retrieval Group". The original list can be found at
@@ -338,28 +345,276 @@ ENGLISH_STOP_WORDS = frozenset(
 
 TOKEN_REGEX = re.compile(r"(?u)\b\w\w+\b")
 
-HEADING_TAGS_XPATHS = {
-    "h1": "//h1",
-    "h2": "//h2",
-    "h3": "//h3",
-    "h4": "//h4",
-    "h5": "//h5",
-    "h6": "//h6",
-}
-
-ADDITIONAL_TAGS_XPATHS = {
-    "title": "//title/text()",
-    "meta_desc": '//meta[@name="description"]/@content',
-    "viewport": '//meta[@name="viewport"]/@content',
-    "charset": "//meta[@charset]/@charset",
-    "canonical": '//link[@rel="canonical"]/@href',
-    "alt_href": '//link[@rel="alternate"]/@href',
-    "alt_hreflang": '//link[@rel="alternate"]/@hreflang',
-    "og_title": '//meta[@property="og:title"]/@content',
-    "og_desc": '//meta[@property="og:description"]/@content',
-    "og_url": '//meta[@property="og:url"]/@content',
-    "og_image": '//meta[@property="og:image"]/@content',
-}
+# Tokens of visible text are counted and dropped once this many pile up
+TEXT_BATCH = 1 << 16
+
+# Text inside these is not shown to visitors
+INVISIBLE_TAGS = frozenset(["style", "script"])
+
+# Attributes whose value is a whitespace separated list, as BeautifulSoup
+# printed them in warnings
+MULTI_VALUED_ATTRIBUTES = frozenset(["class", "accesskey", "dropzone"])
+
+_parsers = threading.local()
+
+
+def parse_html(raw_html, encoding="utf-8"):
+    """
+    Parses a page into an lxml tree. lxml parsers can not be shared between
+    threads, so every thread gets its own.
+    """
+
+    parser = getattr(_parsers, "parser", None)
+
+    if parser is None:
+        parser = _parsers.parser = lh.HTMLParser(encoding=encoding)
+
+    try:
+        return lh.document_fromstring(raw_html.encode(encoding), parser=parser)
+    except etree.ParserError:
+        # nothing but whitespace or comments
+        return lh.document_fromstring("<html></html>")
+
+
+def walk(root, engine):
+    """
+    Walks a parsed page once, returning the strings of text a visitor would
+    see, in document order, and the elements each rule of ``engine`` looks
+    at. Text on both sides of a comment is joined, as if the comment was
+    never there.
+    """
+
+    texts = []
+    buckets = engine.buckets()
+    dispatch = engine.dispatch
+
+    for event, element in etree.iterwalk(root, events=("start", "end", "comment")):
+        if event == "start":
+            for index in dispatch.get(element.tag, ()):
+                buckets[index].append(element)
+
+            if element.text and element.tag not in INVISIBLE_TAGS:
+                texts.append(element.text)
+            continue
+
+        tail = element.tail
+        parent = element.getparent()
+
+        if not tail or parent is None or parent.tag in INVISIBLE_TAGS:
+            continue
+
+        if event == "comment":
+            previous = element.getprevious()
+            before = parent.text if previous is None else previous.tail
+
+            if before:
+                texts[-1] += tail
+                continue
+
+        texts.append(tail)
+
+    return texts, buckets
+
+
+def tag_markup(element):
+    """
+    Prints an empty element of the lowercased page like BeautifulSoup did,
+    so warnings that include the tag read the same as they always have
+    """
+
+    attributes = []
+
+    for name, value in sorted(element.items()):
+        value = value.lower()
+
+        if name in MULTI_VALUED_ATTRIBUTES:
+            value = " ".join(value.split())
+
+        value = value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+        quote = '"'
+
+        if '"' in value:
+            if "'" in value:
+                value = value.replace('"', "&quot;")
+            else:
+                quote = "'"
+
+        attributes.append(f" {name}={quote}{value}{quote}")
+
+    return f"<{element.tag}{''.join(attributes)}/>"
+
+
+class TextCounter:
+    """
+    Counts the words, bigrams and trigrams of visible text handed over a
+    string at a time. Tokens are counted in batches of TEXT_BATCH and then
+    dropped, so neither the text nor its tokens are kept.
+    """
+
+    def __init__(self, text_engine, fingerprint=False):
+        self.text_engine = text_engine
+        self.total = 0
+        self.freq_dist = Counter()
+        self.fingerprint = MinHash() if fingerprint else None
+        self.pending = []
+
+        if text_engine == "numpy":
+            self.token_ids = TokenIds()
+        else:
+            self.bigrams = Counter()
+            self.trigrams = Counter()
+            # the tokens n-grams of the next batch start with
+            self.last = []
+
+    def add(self, text):
+        self.pending.extend(TOKEN_REGEX.findall(text.lower()))
+
+        if len(self.pending) >= TEXT_BATCH:
+            self.flush()
+
+    def flush(self):
+        tokens = self.pending
+
+        if not tokens:
+            return
+
+        self.pending = []
+        self.total += len(tokens)
+        self.freq_dist.update(word for word in tokens if word not in ENGLISH_STOP_WORDS)
+
+        if self.fingerprint is not None:
+            self.fingerprint.update(tokens)
+
+        if self.text_engine == "numpy":
+            self.token_ids.add(tokens)
+            return
+
+        run = self.last + tokens
+        bigrams = run[max(len(self.last) - 1, 0) :]
+        self.bigrams.update(map(" ".join, zip(bigrams, bigrams[1:])))
+        self.trigrams.update(map(" ".join, zip(run, run[1:], run[2:])))
+        self.last = run[-2:]
+
+
+class StreamedElement:
+    """
+    The parts of an element the rules read, kept without a tree. ``text``
+    holds the pieces of text inside it, with None wherever a text node ends.
+    """
+
+    __slots__ = ("tag", "attrib", "text")
+
+    def __init__(self, tag, attrib):
+        self.tag = tag
+        self.attrib = dict(attrib)
+        self.text = []
+
+    def get(self, name, default=None):
+        return self.attrib.get(name, default)
+
+    def items(self):
+        return self.attrib.items()
+
+    def text_content(self):
+        return "".join(piece for piece in self.text if piece is not None)
+
+    def itertext(self):
+        node = []
+
+        for piece in self.text + [None]:
+            if piece is not None:
+                node.append(piece)
+            elif node:
+                yield "".join(node)
+                node = []
+
+
+class StreamingSelector:
+    """
+    lxml parser target doing the work of walk() while the page is being
+    parsed, so no tree is built. Visible text is handed to ``on_text`` a run
+    at a time, and only the elements the rules look at are kept.
+
+    Like the tree parse_html() builds, everything after the end of the root
+    element is dropped: lxml reports it as a second document.
+    """
+
+    def __init__(self, engine, on_text):
+        self.stack = []
+        self.finished = False
+        # (depth, element) of the open elements whose text is collected
+        self.collecting = []
+        self.pieces = []
+        self.on_text = on_text
+        self.dispatch = engine.dispatch
+        self.buckets = engine.buckets()
+
+    def flush(self):
+        """
+        Ends the current run of text at an element boundary
+        """
+
+        if self.pieces:
+            if self.stack and self.stack[-1] not in INVISIBLE_TAGS:
+                self.on_text("".join(self.pieces))
+            self.pieces = []
+
+    def split(self):
+        """
+        Ends the current text node of the elements being collected
+        """
+
+        for depth, element in self.collecting:
+            element.text.append(None)
+
+    def start(self, tag, attrib):
+        if self.finished:
+            return
+
+        self.flush()
+        self.split()
+        indexes = self.dispatch.get(tag)
+
+        if indexes:
+            element = StreamedElement(tag, attrib)
+            self.collecting.append((len(self.stack), element))
+
+            for index in indexes:
+                self.buckets[index].append(element)
+
+        self.stack.append(tag)
+
+    def end(self, tag):
+        if self.finished:
+            return
+
+        self.flush()
+        self.split()
+        self.stack.pop()
+        self.finished = not self.stack
+
+        while self.collecting and self.collecting[-1][0] >= len(self.stack):
+            self.collecting.pop()
+
+    def data(self, data):
+        if self.finished:
+            return
+
+        self.pieces.append(data)
+
+        for depth, element in self.collecting:
+            element.text.append(data)
+
+    def comment(self, text):
+        # a comment splits text nodes, but not the text a visitor sees
+        if not self.finished:
+            self.split()
+
+    def close(self):
+        self.flush()
+
+        return self.buckets
+
 
 IMAGE_EXTENSIONS = set(
     [
@@ -375,6 +630,27 @@ IMAGE_EXTENSIONS = set(
     ]
 )
 
+# Pages larger than this are analyzed as they download, without a tree
+STREAM_THRESHOLD = 2 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Responses of any other media type are not downloaded
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+# The attributes analyze() derives from the html of a page
+ANALYSIS_FIELDS = (
+    "title",
+    "description",
+    "keywords",
+    "warnings",
+    "links",
+    "total_word_count",
+    "wordcount",
+    "bigrams",
+    "trigrams",
+    "stem_to_word",
+)
+
 
 class Page:
     """
@@ -388,6 +664,12 @@ class Page:
         analyze_headings=False,
         analyze_extra_tags=False,
         encoding="utf-8",
+        depth=0,
+        stream_threshold=STREAM_THRESHOLD,
+        rules=None,
+        disabled_rules=(),
+        text_engine="python",
+        near_duplicates=False,
     ):
         """
         Variables go here, *not* outside of __init__
@@ -399,6 +681,14 @@ class Page:
         self.analyze_headings = analyze_headings
         self.analyze_extra_tags = analyze_extra_tags
         self.encoding = encoding
+        self.depth = depth
+        self.stream_threshold = stream_threshold
+        self.streamed = False
+        self.rules = None if rules is None else tuple(rules)
+        self.disabled_rules = tuple(disabled_rules)
+        self.rule_times = {}
+        self.text_engine = text_engine
+        self.near_duplicates = near_duplicates
         self.title = ""
         self.description = ""
         self.keywords = {}
@@ -413,6 +703,11 @@ class Page:
         self.trigrams = Counter()
         self.stem_to_word = {}
         self.content_hash = None
+        self.fingerprint = None
+        self.wire_bytes = None
+        self.content_bytes = None
+        self.truncated = False
+        self.redirects = []
 
         if analyze_headings:
             self.headings = {}
@@ -430,10 +725,17 @@ class Page:
             "description": self.description,
             "word_count": self.total_word_count,
             "keywords": self.sort_freq_dist(self.keywords, limit=5),
-            "bigrams": self.bigrams,
-            "trigrams": self.trigrams,
+            "bigrams": materialize(self.bigrams),
+            "trigrams": materialize(self.trigrams),
             "warnings": self.warnings,
             "content_hash": self.content_hash,
+            "wire_bytes": self.wire_bytes,
+            "content_bytes": self.content_bytes,
+            "redirects": [
+                {"url": url, "status": status, "location": location}
+                for url, status, location in self.redirects
+            ],
+            "redirect_hops": len(self.redirects),
         }
 
         if self.analyze_headings:
@@ -443,138 +745,265 @@ class Page:
 
         return context
 
-    def populate(self, bs):
+    def populate(self, titles, descr, keywords):
         """
-        Populates the instance variables from BeautifulSoup
+        Populates the title and description from the page's title and meta
+        description elements
         """
 
-        try:
-            self.title = bs.title.text
-        except AttributeError:
-            self.title = "No Title"
+        self.populate_title(titles)
+        self.populate_description(descr)
+        self.check_keywords(keywords)
 
-        descr = bs.findAll("meta", attrs={"name": "description"})
+    def populate_title(self, titles):
+        if titles:
+            self.title = titles[0].text_content().lower()
+        else:
+            self.title = "No Title"
 
+    def populate_description(self, descr):
         if len(descr) > 0:
             self.description = descr[0].get("content")
 
-        keywords = bs.findAll("meta", attrs={"name": "keywords"})
+            if self.description is not None:
+                self.description = self.description.lower()
 
+    def check_keywords(self, keywords):
         if len(keywords) > 0:
+            keywords = ", ".join(tag_markup(tag) for tag in keywords)
             self.warn(
-                f"Keywords should be avoided as they are a spam indicator and no longer used by Search Engines: {keywords}"
+                f"Keywords should be avoided as they are a spam indicator and no longer used by Search Engines: [{keywords}]"
             )
 
-    def analyze_heading_tags(self, bs):
+    def analyze_heading_tags(self, headings):
         """
         Analyze the heading tags and populate the headings
         """
 
-        try:
-            dom = lh.fromstring(str(bs))
-        except ValueError as _:
-            dom = lh.fromstring(bs.encode(self.encoding))
-        for tag, xpath in HEADING_TAGS_XPATHS.items():
-            value = [heading.text_content() for heading in dom.xpath(xpath)]
+        for tag, elements in headings.items():
+            value = [str(heading.text_content()) for heading in elements]
             if value:
                 self.headings.update({tag: value})
 
-    def analyze_additional_tags(self, bs):
+    def analyze_additional_tags(self, additional):
         """
         Analyze additional tags and populate the additional info
         """
 
-        try:
-            dom = lh.fromstring(str(bs))
-        except ValueError as _:
-            dom = lh.fromstring(bs.encode(self.encoding))
-        for tag, xpath in ADDITIONAL_TAGS_XPATHS.items():
-            value = dom.xpath(xpath)
+        for tag, value in additional.items():
             if value:
                 self.additional_info.update({tag: value})
 
-    def analyze(self, raw_html=None):
+    def hash_content(self, raw_html):
         """
-        Analyze the page and populate the warnings list
+        Sets and returns the hash identifying this version of the page
+        """
+
+        self.content_hash = hashlib.sha1(raw_html.encode(self.encoding)).hexdigest()
+
+        return self.content_hash
+
+    def analysis_state(self):
+        """
+        Returns everything analyze() worked out from the html, so it can be
+        stored and reused while the page does not change
+        """
+
+        state = {field: getattr(self, field) for field in ANALYSIS_FIELDS}
+
+        if self.analyze_headings:
+            state["headings"] = self.headings
+        if self.analyze_extra_tags:
+            state["additional_info"] = self.additional_info
+        if self.near_duplicates:
+            state["fingerprint"] = self.fingerprint
+
+        return state
+
+    def restore_analysis(self, state):
+        """
+        Restores the output of analysis_state() instead of analyzing again
+        """
+
+        for field, value in state.items():
+            setattr(self, field, value)
+
+    def fetch(self, client=None):
         """
+        Download the page and return its decoded html, or None (with a
+        warning) if it can not be read.
+
+        A page larger than ``stream_threshold`` is analyzed while it
+        downloads instead, and None is returned for it as well.
+        """
+
+        if client is None:
+            client = http
+
+        valid_prefixes = []
+
+        # only allow http:// https:// and //
+        for s in [
+            "http://",
+            "https://",
+            "//",
+        ]:
+            valid_prefixes.append(self.url.startswith(s))
+
+        if True not in valid_prefixes:
+            self.warn(f"{self.url} does not appear to have a valid protocol.")
+            return None
+
+        if self.url.startswith("//"):
+            self.url = f"{self.base_domain.scheme}:{self.url}"
+
+        if self.parsed_url.netloc != self.base_domain.netloc:
+            self.warn(f"{self.url} is not part of {self.base_domain.netloc}.")
+            return None
+
+        try:
+            page = client.get(self.url, HTML_CONTENT_TYPES, self.stream_threshold)
+        except HTTPError as e:
+            self.warn(f"Returned {e}")
+            return None
+
+        self.wire_bytes = page.wire_bytes
+        self.redirects = page.redirects
+
+        if page.chunks is None:
+            self.content_bytes = len(page.data)
+
+        if page.skipped:
+            self.warn(f"Can not read {media_type(page.headers)}")
+            return None
+
+        if page.truncated:
+            self.truncated = True
+            self.warn(
+                f"{self.url} is larger than {len(page.data)} bytes, only the start was analyzed"
+            )
+
+        encoding = "ascii"
 
-        if not raw_html:
-            valid_prefixes = []
+        if "content-type" in page.headers:
+            encoding = page.headers["content-type"].split("charset=")[-1]
 
-            # only allow http:// https:// and //
-            for s in [
-                "http://",
-                "https://",
-                "//",
-            ]:
-                valid_prefixes.append(self.url.startswith(s))
+        if encoding.lower() not in ("text/html", "text/plain", self.encoding):
+            # there is no unicode function in Python3
+            # try:
+            #     raw_html = unicode(page.read(), encoding)
+            # except:
+            self.warn(f"Can not read {encoding}")
 
-            if True not in valid_prefixes:
-                self.warn(f"{self.url} does not appear to have a valid protocol.")
-                return
+            if page.chunks is not None:
+                page.chunks.close()
 
-            if self.url.startswith("//"):
-                self.url = f"{self.base_domain.scheme}:{self.url}"
+            return None
 
-            if self.parsed_url.netloc != self.base_domain.netloc:
-                self.warn(f"{self.url} is not part of {self.base_domain.netloc}.")
-                return
+        if page.chunks is not None:
+            self.content_bytes = 0
+
+            def counted(chunks):
+                for chunk in chunks:
+                    self.content_bytes += len(chunk)
+                    yield chunk
 
             try:
-                page = http.get(self.url)
+                self.analyze_stream(counted(page.chunks))
             except HTTPError as e:
                 self.warn(f"Returned {e}")
-                return
+            finally:
+                self.wire_bytes = page.wire_bytes
 
-            encoding = "ascii"
+            if page.truncated:
+                self.truncated = True
+                self.warn(
+                    f"{self.url} is larger than {self.content_bytes} bytes, only the start was analyzed"
+                )
 
-            if "content-type" in page.headers:
-                encoding = page.headers["content-type"].split("charset=")[-1]
+            return None
 
-            if encoding.lower() not in ("text/html", "text/plain", self.encoding):
-                # there is no unicode function in Python3
-                # try:
-                #     raw_html = unicode(page.read(), encoding)
-                # except:
-                self.warn(f"Can not read {encoding}")
-                return
-            else:
-                raw_html = page.data.decode(self.encoding)
+        return page.data.decode(self.encoding)
 
-        self.content_hash = hashlib.sha1(raw_html.encode(self.encoding)).hexdigest()
+    def analyze(self, raw_html=None):
+        """
+        Analyze the page and populate the warnings list
+        """
 
-        # remove comments, they screw with BeautifulSoup
-        clean_html = re.sub(r"<!--.*?-->", r"", raw_html, flags=re.DOTALL)
+        if raw_html is None:
+            raw_html = self.fetch()
 
-        soup_lower = BeautifulSoup(
-            clean_html.lower(), "html.parser"
-        )  # .encode('utf-8')
-        soup_unmodified = BeautifulSoup(clean_html, "html.parser")  # .encode('utf-8')
+            if raw_html is None:
+                return self.streamed or None
 
-        texts = soup_lower.findAll(text=True)
-        visible_text = [w for w in filter(self.visible_tags, texts)]
+        if self.stream_threshold is not None and len(raw_html) > self.stream_threshold:
+            chunks = (
+                raw_html[i : i + STREAM_CHUNK_SIZE].encode(self.encoding)
+                for i in range(0, len(raw_html), STREAM_CHUNK_SIZE)
+            )
+            return self.analyze_stream(chunks)
 
-        self.process_text(visible_text)
+        self.hash_content(raw_html)
 
-        self.populate(soup_lower)
+        # one parse and one walk over it feed every rule
+        engine = self.rule_engine()
+        texts, buckets = walk(parse_html(raw_html, self.encoding), engine)
+        self.report(engine, texts, buckets)
 
-        self.analyze_title()
-        self.analyze_description()
-        self.analyze_og(soup_lower)
-        self.analyze_a_tags(soup_unmodified)
-        self.analyze_img_tags(soup_lower)
-        self.analyze_h1_tags(soup_lower)
+        return True
 
-        if self.analyze_headings:
-            self.analyze_heading_tags(soup_unmodified)
-        if self.analyze_extra_tags:
-            self.analyze_additional_tags(soup_unmodified)
+    def analyze_stream(self, chunks):
+        """
+        Analyze a page from the chunks of its encoded html, parsing them as
+        they come without building a tree
+        """
+
+        engine = self.rule_engine()
+        counter = self.text_counter()
+        selector = StreamingSelector(engine, counter.add)
+        parser = lh.HTMLParser(target=selector, encoding=self.encoding)
+        content_hash = hashlib.sha1()
+
+        for chunk in chunks:
+            content_hash.update(chunk)
+            parser.feed(chunk)
+
+        try:
+            buckets = parser.close()
+        except etree.XMLSyntaxError:
+            # nothing but whitespace or comments
+            buckets = selector.close()
+
+        self.content_hash = content_hash.hexdigest()
+        self.streamed = True
+        self.count_text(counter)
+        engine.run(self, buckets)
 
         return True
 
+    def rule_engine(self):
+        """
+        Returns the compiled rules this page is checked with
+        """
+
+        return compile_rules(
+            self.rules,
+            self.disabled_rules,
+            self.analyze_headings,
+            self.analyze_extra_tags,
+        )
+
+    def report(self, engine, texts, buckets):
+        """
+        Counts the words of the visible text and runs every rule over the
+        elements collected for it
+        """
+
+        self.process_text(texts)
+        engine.run(self, buckets)
+
     def word_list_freq_dist(self, wordlist):
-        freq = [wordlist.count(w) for w in wordlist]
-        return dict(zip(wordlist, freq))
+        return dict(Counter(wordlist))
 
     def sort_freq_dist(self, freqdist, limit=1):
         aux = [
@@ -599,63 +1028,64 @@ class Page:
     def getngrams(self, D, n=2):
         return zip(*[D[i:] for i in range(n)])
 
+    def text_counter(self):
+        return TextCounter(self.text_engine, self.near_duplicates)
+
     def process_text(self, vt):
-        page_text = ""
+        """
+        Counts the words, bigrams and trigrams of the visible text. Each
+        string is tokenized once and every count is a single pass over the
+        tokens.
+        """
 
-        for element in vt:
-            if element.strip():
-                page_text += element.strip().lower() + " "
+        counter = self.text_counter()
 
-        tokens = self.tokenize(page_text)
-        raw_tokens = self.raw_tokenize(page_text)
-        self.total_word_count = len(raw_tokens)
+        for element in vt:
+            counter.add(element)
 
-        bigrams = self.getngrams(raw_tokens, 2)
+        self.count_text(counter)
 
-        for ng in bigrams:
-            vt = " ".join(ng)
-            self.bigrams[vt] += 1
+    def count_text(self, counter):
+        """
+        Takes over the counts of a TextCounter fed the page's visible text
+        """
 
-        trigrams = self.getngrams(raw_tokens, 3)
+        counter.flush()
+        self.total_word_count = counter.total
 
-        for ng in trigrams:
-            vt = " ".join(ng)
-            self.trigrams[vt] += 1
+        if counter.fingerprint is not None:
+            self.fingerprint = counter.fingerprint.signature()
 
-        freq_dist = self.word_list_freq_dist(tokens)
+        if self.text_engine == "numpy":
+            tokens, ids = counter.token_ids.arrays()
+            self.bigrams = TokenCounts.count(tokens, ids, 2)
+            self.trigrams = TokenCounts.count(tokens, ids, 3)
+        else:
+            self.bigrams.update(counter.bigrams)
+            self.trigrams.update(counter.trigrams)
 
-        for word in freq_dist:
-            root = stem(word)
-            cnt = freq_dist[word]
+        freq_dist = counter.freq_dist
 
+        for (word, cnt), root in zip(freq_dist.items(), stem_many(freq_dist)):
             if root not in self.stem_to_word:
                 self.stem_to_word[root] = word
 
-            if root in self.wordcount:
-                self.wordcount[root] += cnt
-            else:
-                self.wordcount[root] = cnt
-
-            if root in self.keywords:
-                self.keywords[root] += cnt
-            else:
-                self.keywords[root] = cnt
+            self.wordcount[root] += cnt
+            self.keywords[root] = self.keywords.get(root, 0) + cnt
 
-    def analyze_og(self, bs):
+    def analyze_og(self, properties):
         """
         Validate open graph tags
         """
-        og_title = bs.findAll("meta", attrs={"property": "og:title"})
-        og_description = bs.findAll("meta", attrs={"property": "og:description"})
-        og_image = bs.findAll("meta", attrs={"property": "og:image"})
+        properties = set(value.lower() for value in properties)
 
-        if len(og_title) == 0:
+        if "og:title" not in properties:
             self.warn("Missing og:title")
 
-        if len(og_description) == 0:
+        if "og:description" not in properties:
             self.warn("Missing og:description")
 
-        if len(og_image) == 0:
+        if "og:image" not in properties:
             self.warn("Missing og:image")
 
     def analyze_title(self):
@@ -702,48 +1132,28 @@ class Page:
                 "Description is too long (more than 255 characters): {0}".format(d)
             )
 
-    def visible_tags(self, element):
-        if element.parent.name in ["style", "script", "[document]"]:
-            return False
-
-        return True
-
-    def analyze_img_tags(self, bs):
+    def analyze_img_tags(self, images):
         """
         Verifies that each img has an alt and title
         """
-        images = bs.find_all("img")
-
         for image in images:
-            src = ""
-            if "src" in image:
-                src = image["src"]
-            elif "data-src" in image:
-                src = image["data-src"]
-            else:
-                src = image
-
             if len(image.get("alt", "")) == 0:
-                self.warn("Image missing alt tag: {0}".format(src))
+                self.warn("Image missing alt tag: {0}".format(tag_markup(image)))
 
-    def analyze_h1_tags(self, bs):
+    def analyze_h1_tags(self, has_h1):
         """
         Make sure each page has at least one H1 tag
         """
-        htags = bs.find_all("h1")
-
-        if len(htags) == 0:
+        if not has_h1:
             self.warn("Each page should have at least one h1 tag")
 
-    def analyze_a_tags(self, bs):
+    def analyze_a_tags(self, anchors):
         """
         Add any new links (that we didn't find in the sitemap)
         """
-        anchors = bs.find_all("a", href=True)
-
         for tag in anchors:
-            tag_href = tag["href"]
-            tag_text = tag.text.lower().strip()
+            tag_href = tag.get("href")
+            tag_text = tag.text_content().lower().strip()
 
             if len(tag.get("title", "")) == 0:
                 self.warn("Anchor missing title tag: {0}".format(tag_href))
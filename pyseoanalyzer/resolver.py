@@ -0,0 +1,275 @@
+import ipaddress
+import os
+import socket
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib3.util.connection import allowed_gai_family
+
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:  # only needed to honour record TTLs
+    dns = None
+
+if os.name == "nt":
+    HOSTS_FILE = os.path.join(
+        os.environ.get("SystemRoot", r"C:\Windows"),
+        "System32",
+        "drivers",
+        "etc",
+        "hosts",
+    )
+else:
+    HOSTS_FILE = "/etc/hosts"
+
+
+def is_ip_address(host):
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return False
+
+    return True
+
+
+def hosts_file_names(path):
+    """
+    Returns the lowercased names a hosts file lists
+    """
+
+    names = set()
+
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                names.update(name.lower().rstrip(".") for name in fields[1:])
+    except OSError:
+        pass
+
+    return names
+
+
+class Resolver:
+    """
+    In-process DNS cache shared by the crawler and the HTTP connection pool.
+
+    With dnspython installed a host is looked up with one DNS query per
+    address family, and the answer is kept for as long as its records' TTL
+    says, clamped to ``min_ttl``..``max_ttl``. Names in the hosts file, IP
+    literals, local names and hosts whose DNS query fails for any other
+    reason than the name not existing go through the system resolver
+    (getaddrinfo()), as does everything without dnspython. Those answers carry no TTL and are
+    kept for ``default_ttl`` seconds. Failed lookups are cached for
+    ``negative_ttl`` seconds so a dead host is not looked up on every link
+    pointing at it.
+    """
+
+    def __init__(
+        self,
+        default_ttl=300.0,
+        negative_ttl=30.0,
+        min_ttl=5.0,
+        max_ttl=3600.0,
+        prefetch_workers=2,
+        hosts_file=HOSTS_FILE,
+    ):
+        self.default_ttl = default_ttl
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.prefetch_workers = prefetch_workers
+        self.hosts_file_names = hosts_file_names(hosts_file)
+        self.dns = None
+
+        if dns is not None:
+            try:
+                self.dns = dns.resolver.Resolver()
+            except dns.exception.DNSException:
+                # e.g. no resolv.conf, getaddrinfo() still works
+                pass
+
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.executor = None
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.lookups = 0
+        self.lookup_time = 0.0
+
+    def system_only(self, host):
+        """
+        Returns True for names only the system resolver knows: IP literals,
+        names of the hosts file, single labels the search domains complete,
+        localhost and mDNS (.local) names
+        """
+
+        if is_ip_address(host):
+            return True
+
+        name = host.lower().rstrip(".")
+
+        return (
+            name in self.hosts_file_names
+            or "." not in name
+            or name.endswith((".localhost", ".local"))
+        )
+
+    def query(self, host):
+        """
+        Returns the getaddrinfo() style addresses of a host and how many
+        seconds they may be cached, raising socket.gaierror if it does not
+        resolve
+        """
+
+        if self.dns is not None and not self.system_only(host):
+            try:
+                addresses, ttl = self.query_dns(host)
+            except dns.exception.DNSException:
+                pass
+            else:
+                return addresses, min(self.max_ttl, max(self.min_ttl, ttl))
+
+        addresses = socket.getaddrinfo(
+            host, None, allowed_gai_family(), socket.SOCK_STREAM
+        )
+
+        return addresses, self.default_ttl
+
+    def query_dns(self, host):
+        """
+        Asks DNS for the A (and, where IPv6 can be used, AAAA) records of a
+        host. Returns them like query() does, with the smallest TTL of the
+        answers, CNAMEs included.
+        """
+
+        families = [(socket.AF_INET, "A")]
+
+        if allowed_gai_family() != socket.AF_INET:
+            families.append((socket.AF_INET6, "AAAA"))
+
+        addresses = []
+        ttl = float("inf")
+
+        for family, rdtype in families:
+            try:
+                answer = self.dns.resolve(host, rdtype, raise_on_no_answer=False)
+            except dns.resolver.NXDOMAIN:
+                raise socket.gaierror(socket.EAI_NONAME, f"{host} does not exist")
+
+            if answer.rrset is None:
+                continue
+
+            ttl = min(ttl, answer.expiration - time.time())
+
+            for record in answer.rrset:
+                if family == socket.AF_INET:
+                    address = (record.address, 0)
+                else:
+                    address = (record.address, 0, 0, 0)
+
+                addresses.append(
+                    (family, socket.SOCK_STREAM, socket.IPPROTO_TCP, "", address)
+                )
+
+        if not addresses:
+            raise socket.gaierror(socket.EAI_NONAME, f"{host} has no addresses")
+
+        return addresses, ttl
+
+    def lookup(self, host):
+        start = time.monotonic()
+
+        try:
+            addresses, ttl = self.query(host)
+            entry = (time.monotonic() + ttl, addresses, None)
+        except socket.gaierror as e:
+            entry = (time.monotonic() + self.negative_ttl, None, e)
+
+        with self.lock:
+            self.lookups += 1
+            self.lookup_time += time.monotonic() - start
+            self.entries[host] = entry
+
+        return entry
+
+    def resolve(self, host):
+        """
+        Returns the getaddrinfo() results for a host, raising socket.gaierror
+        if it does not resolve
+        """
+
+        with self.lock:
+            entry = self.entries.get(host)
+
+            if entry is not None and entry[0] > time.monotonic():
+                if entry[1] is None:
+                    self.negative_hits += 1
+                else:
+                    self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+
+        if entry is None:
+            entry = self.lookup(host)
+
+        if entry[1] is None:
+            raise entry[2]
+
+        return entry[1]
+
+    def addresses(self, host):
+        """
+        Returns every address to connect to for a host, in the order
+        getaddrinfo() gave them
+        """
+
+        if is_ip_address(host):
+            return [host]
+
+        return list(dict.fromkeys(info[4][0] for info in self.resolve(host)))
+
+    def prefetch(self, hosts):
+        """
+        Resolves hosts in the background so they are cached by the time the
+        crawler connects to them
+        """
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.prefetch_workers)
+
+            now = time.monotonic()
+            missing = [
+                host
+                for host in hosts
+                if host not in self.entries or self.entries[host][0] <= now
+            ]
+
+        for host in missing:
+            self.executor.submit(self.lookup, host)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.negative_hits + self.misses
+
+            return {
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.negative_hits) / lookups if lookups else 0.0
+                ),
+                "lookups": self.lookups,
+                "average_lookup_time": (
+                    self.lookup_time / self.lookups if self.lookups else 0.0
+                ),
+                "cached_hosts": len(self.entries),
+            }
+
+
+resolver = Resolver()
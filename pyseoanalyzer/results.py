@@ -0,0 +1,86 @@
+import pickle
+import sqlite3
+
+# Bump this whenever a change to Page.analyze changes its output, so results
+# stored by older versions are not reused.
+RESULT_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    url TEXT NOT NULL,
+    options TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    state BLOB NOT NULL,
+    PRIMARY KEY (url, options)
+);
+"""
+
+
+def options_key(
+    analyze_headings,
+    analyze_extra_tags,
+    rules=(),
+    text_engine="python",
+    near_duplicates=False,
+):
+    return (
+        f"v{RESULT_VERSION}"
+        f":headings={int(bool(analyze_headings))}"
+        f":extra_tags={int(bool(analyze_extra_tags))}"
+        f":rules={','.join(rules)}"
+        f":text={text_engine}"
+        f":fingerprint={int(bool(near_duplicates))}"
+    )
+
+
+class ResultStore:
+    """
+    Keeps the analysis of every page between runs, keyed by url, content hash
+    and the analyzer options. A page whose html hashes the same as last time
+    gets its stored analysis back instead of being parsed again. Only the
+    latest version of each url is kept.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url, content_hash, options):
+        row = self.connection.execute(
+            "SELECT state FROM results WHERE url = ? AND options = ? AND content_hash = ?",
+            (url, options, content_hash),
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        return pickle.loads(row[0])
+
+    def put(self, page, options):
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (
+                    page.url,
+                    options,
+                    page.content_hash,
+                    pickle.dumps(page.analysis_state(), pickle.HIGHEST_PROTOCOL),
+                ),
+            )
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self):
+        self.connection.close()
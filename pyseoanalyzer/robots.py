@@ -0,0 +1,186 @@
+import re
+import threading
+import time
+
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+from .http import USER_AGENT
+from .http import http
+
+# RFC 9309 lets crawlers ignore anything past the first 500 KiB
+MAX_ROBOTS_BYTES = 500 * 1024
+
+
+def compile_rule(pattern):
+    """
+    Returns a function telling whether a path matches a robots.txt pattern.
+    Plain patterns are prefix matches, patterns using ``*`` or a trailing
+    ``$`` are turned into a regular expression once, here.
+    """
+
+    if "*" not in pattern and not pattern.endswith("$"):
+        return lambda path: path.startswith(pattern)
+
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    if anchored:
+        regex += "$"
+
+    return re.compile(regex).match
+
+
+class RobotsRules:
+    """
+    The rules of one robots.txt group. The longest matching pattern decides,
+    and allow wins a tie.
+    """
+
+    def __init__(self, rules=(), crawl_delay=None):
+        # longest first, allow before disallow, so the first match decides
+        ordered = sorted(rules, key=lambda rule: (-len(rule[1]), not rule[0]))
+        self.rules = [
+            (allow, compile_rule(pattern)) for allow, pattern in ordered if pattern
+        ]
+        self.crawl_delay = crawl_delay
+
+    def allowed(self, path):
+        for allow, match in self.rules:
+            if match(path):
+                return allow
+
+        return True
+
+
+ALLOW_ALL = RobotsRules()
+DISALLOW_ALL = RobotsRules([(False, "/")])
+
+
+def parse_robots(text, user_agent=USER_AGENT):
+    """
+    Returns the RobotsRules of the group that applies to the user agent,
+    falling back to the ``*`` group
+    """
+
+    user_agent = user_agent.lower()
+    groups = {}
+    agents = []
+    in_rules = False
+
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+
+        if ":" not in line:
+            continue
+
+        field, _, value = line.partition(":")
+        field = field.strip().lower()
+        value = value.strip()
+
+        if field == "user-agent":
+            if in_rules:
+                agents = []
+                in_rules = False
+
+            agents.append(value.lower())
+            for agent in agents:
+                groups.setdefault(agent, {"rules": [], "crawl_delay": None})
+        elif field in ("allow", "disallow", "crawl-delay"):
+            in_rules = True
+
+            for agent in agents:
+                if field == "crawl-delay":
+                    try:
+                        groups[agent]["crawl_delay"] = float(value)
+                    except ValueError:
+                        pass
+                else:
+                    groups[agent]["rules"].append((field == "allow", value))
+
+    group = None
+
+    for agent in groups:
+        if agent != "*" and agent in user_agent:
+            group = groups[agent]
+            break
+
+    if group is None:
+        group = groups.get("*")
+
+    if group is None:
+        return ALLOW_ALL
+
+    return RobotsRules(group["rules"], group["crawl_delay"])
+
+
+class RobotsCache:
+    """
+    Fetches robots.txt once per host and keeps it for ``ttl`` seconds.
+
+    A missing robots.txt (4xx) allows everything, a server error disallows
+    everything until it is fetched again, as RFC 9309 asks. If the host can
+    not be reached at all the urls are let through, so the page fetch itself
+    reports the failure. Crawl-delay is passed on to the scheduler given as
+    ``client``, if it has one.
+    """
+
+    def __init__(self, client=None, user_agent=USER_AGENT, ttl=24 * 60 * 60):
+        self.client = client or http
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.fetches = 0
+
+    def fetch(self, scheme, netloc):
+        self.fetches += 1
+
+        try:
+            response = self.client.get(
+                urlunsplit((scheme, netloc, "/robots.txt", "", ""))
+            )
+        except Exception:
+            return ALLOW_ALL
+
+        if 200 <= response.status < 300:
+            text = response.data[:MAX_ROBOTS_BYTES].decode("utf-8", "replace")
+            rules = parse_robots(text, self.user_agent)
+        elif response.status >= 500:
+            rules = DISALLOW_ALL
+        else:
+            rules = ALLOW_ALL
+
+        if rules.crawl_delay and hasattr(self.client, "set_min_delay"):
+            self.client.set_min_delay(netloc, rules.crawl_delay)
+
+        return rules
+
+    def rules(self, scheme, netloc):
+        key = (scheme, netloc)
+
+        with self.lock:
+            entry = self.hosts.get(key)
+
+            if entry is None or entry[0] <= time.monotonic():
+                entry = (time.monotonic() + self.ttl, self.fetch(scheme, netloc))
+                self.hosts[key] = entry
+
+        return entry[1]
+
+    def allowed(self, url):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        return self.rules(parts.scheme, parts.netloc).allowed(path)
+
+    def stats(self):
+        return {
+            "fetches": self.fetches,
+            "hosts": len(self.hosts),
+        }
@@ -0,0 +1,227 @@
+import functools
+import time
+
+ASCII_LOWERCASE = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz"
+)
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+
+# The keys of additional_info, in the order they are reported
+ADDITIONAL_TAGS = (
+    "title",
+    "meta_desc",
+    "viewport",
+    "charset",
+    "canonical",
+    "alt_href",
+    "alt_hreflang",
+    "og_title",
+    "og_desc",
+    "og_url",
+    "og_image",
+)
+
+# meta attributes copied into additional_info
+ADDITIONAL_META_NAMES = {"description": "meta_desc", "viewport": "viewport"}
+ADDITIONAL_META_PROPERTIES = {
+    "og:title": "og_title",
+    "og:description": "og_desc",
+    "og:url": "og_url",
+    "og:image": "og_image",
+}
+
+# These rules are switched on by the analyze_headings and
+# analyze_extra_tags options rather than by name
+OPTION_RULES = ("headings", "additional_tags")
+
+
+class Rule:
+    """
+    A check run over the elements of a page. ``tags`` are the elements it
+    looks at; ``check(page, elements)`` gets the matching elements in
+    document order.
+    """
+
+    def __init__(self, name, tags, check, default=True):
+        self.name = name
+        self.tags = tuple(tags)
+        self.check = check
+        self.default = default
+
+
+# Registered rules, in the order they run and report their warnings
+RULES = {}
+
+
+def register(name, tags, default=True):
+    """
+    Decorator registering ``check(page, elements)`` as a rule. A rule
+    registered with ``default=False`` only runs when it is asked for by name.
+    """
+
+    def decorator(check):
+        RULES[name] = Rule(name, tags, check, default)
+        compile_rules.cache_clear()
+
+        return check
+
+    return decorator
+
+
+class RuleEngine:
+    """
+    The rules of one run, with every tag mapped to the rules looking at it,
+    so a single walk over a page can hand each element to all of them
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.names = tuple(rule.name for rule in rules)
+        self.dispatch = {}
+
+        for index, rule in enumerate(rules):
+            for tag in rule.tags:
+                self.dispatch.setdefault(tag, []).append(index)
+
+    def buckets(self):
+        """
+        Returns an empty list per rule, for the walk to collect elements in
+        """
+
+        return [[] for _ in self.rules]
+
+    def run(self, page, buckets):
+        """
+        Runs every rule over the elements collected for it, adding the CPU
+        time each one takes to ``page.rule_times``
+        """
+
+        for rule, elements in zip(self.rules, buckets):
+            started = time.thread_time()
+            rule.check(page, elements)
+            page.rule_times[rule.name] = (
+                page.rule_times.get(rule.name, 0.0) + time.thread_time() - started
+            )
+
+
+@functools.lru_cache(maxsize=None)
+def compile_rules(enabled=None, disabled=(), headings=False, extra_tags=False):
+    """
+    Returns the RuleEngine running the ``enabled`` rules (every default rule
+    if None) except the ``disabled`` ones. Raises ValueError for a name that
+    is not registered.
+    """
+
+    if enabled is None:
+        names = {name for name, rule in RULES.items() if rule.default}
+    else:
+        names = set(enabled)
+
+    unknown = sorted((names | set(disabled)) - RULES.keys())
+
+    if unknown:
+        raise ValueError(f"Unknown rules: {', '.join(unknown)}")
+
+    names -= set(OPTION_RULES)
+
+    if headings:
+        names.add("headings")
+    if extra_tags:
+        names.add("additional_tags")
+
+    names -= set(disabled)
+
+    return RuleEngine([rule for name, rule in RULES.items() if name in names])
+
+
+def lowered_name(element):
+    name = element.get("name")
+
+    return name.translate(ASCII_LOWERCASE) if name else None
+
+
+@register("keywords", ("meta",))
+def check_keywords(page, metas):
+    page.check_keywords([meta for meta in metas if lowered_name(meta) == "keywords"])
+
+
+@register("title", ("title",))
+def check_title(page, titles):
+    page.populate_title(titles)
+    page.analyze_title()
+
+
+@register("description", ("meta",))
+def check_description(page, metas):
+    page.populate_description(
+        [meta for meta in metas if lowered_name(meta) == "description"]
+    )
+    page.analyze_description()
+
+
+@register("og", ("meta",))
+def check_og(page, metas):
+    page.analyze_og(
+        [meta.get("property") for meta in metas if meta.get("property") is not None]
+    )
+
+
+@register("links", ("a",))
+def check_links(page, anchors):
+    page.analyze_a_tags(
+        [anchor for anchor in anchors if anchor.get("href") is not None]
+    )
+
+
+@register("images", ("img",))
+def check_images(page, images):
+    page.analyze_img_tags(images)
+
+
+@register("h1", ("h1",))
+def check_h1(page, headings):
+    page.analyze_h1_tags(len(headings) > 0)
+
+
+@register("headings", HEADING_TAGS, default=False)
+def collect_headings(page, headings):
+    by_tag = {tag: [] for tag in HEADING_TAGS}
+
+    for heading in headings:
+        by_tag[heading.tag].append(heading)
+
+    page.analyze_heading_tags(by_tag)
+
+
+@register("additional_tags", ("title", "meta", "link"), default=False)
+def collect_additional_tags(page, elements):
+    info = {tag: [] for tag in ADDITIONAL_TAGS}
+
+    for element in elements:
+        if element.tag == "title":
+            info["title"].extend(element.itertext())
+        elif element.tag == "meta":
+            content = element.get("content")
+            name = element.get("name")
+            prop = element.get("property")
+
+            if name in ADDITIONAL_META_NAMES and content is not None:
+                info[ADDITIONAL_META_NAMES[name]].append(content)
+            if element.get("charset") is not None:
+                info["charset"].append(element.get("charset"))
+            if prop in ADDITIONAL_META_PROPERTIES and content is not None:
+                info[ADDITIONAL_META_PROPERTIES[prop]].append(content)
+        else:
+            rel = element.get("rel")
+            href = element.get("href")
+
+            if rel == "canonical" and href is not None:
+                info["canonical"].append(href)
+            elif rel == "alternate":
+                if href is not None:
+                    info["alt_href"].append(href)
+                if element.get("hreflang") is not None:
+                    info["alt_hreflang"].append(element.get("hreflang"))
+
+    page.analyze_additional_tags(info)
@@ -0,0 +1,203 @@
+import math
+import threading
+import time
+
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+# Responses that mean the origin wants us to slow down
+THROTTLE_STATUSES = frozenset([429, 503])
+
+
+def parse_retry_after(value):
+    """
+    Returns the number of seconds a Retry-After header asks us to wait
+    """
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+    """
+    What the scheduler knows about one host
+    """
+
+    def __init__(self, window, min_delay):
+        self.window = float(window)
+        self.min_delay = min_delay
+        self.in_flight = 0
+        self.next_request = 0.0
+        self.average_latency = None
+        self.requests = 0
+        self.throttle_events = 0
+        self.last_decrease = 0.0
+
+    def report(self):
+        return {
+            "window": int(self.window),
+            "in_flight": self.in_flight,
+            "average_latency": self.average_latency,
+            "min_delay": self.min_delay,
+            "requests": self.requests,
+            "throttle_events": self.throttle_events,
+        }
+
+
+class HostScheduler:
+    """
+    Wraps an Http client so requests are polite to every host.
+
+    Each host gets at least ``min_delay`` seconds between the start of two
+    requests and a window of requests allowed in flight at once. The window
+    grows additively (by one per window's worth of fast responses, up to
+    ``max_in_flight``) and is multiplied by ``backoff`` when a response is
+    slower than ``target_latency``, fails, or is a 429/503. A Retry-After
+    header on those responses pauses the host for as long as it asks.
+    """
+
+    def __init__(
+        self,
+        client,
+        min_delay=0.0,
+        max_in_flight=4,
+        initial_window=1,
+        target_latency=2.0,
+        backoff=0.5,
+        smoothing=0.3,
+    ):
+        self.client = client
+        self.min_delay = min_delay
+        self.max_in_flight = max(1, max_in_flight)
+        self.initial_window = min(initial_window, self.max_in_flight)
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.hosts = {}
+        self.condition = threading.Condition()
+
+    def host(self, hostname):
+        if hostname not in self.hosts:
+            self.hosts[hostname] = HostState(self.initial_window, self.min_delay)
+
+        return self.hosts[hostname]
+
+    def set_min_delay(self, hostname, delay):
+        """
+        Raises the minimum delay between requests to a host, e.g. to honour
+        a robots.txt Crawl-delay
+        """
+
+        with self.condition:
+            state = self.host(hostname)
+            state.min_delay = max(self.min_delay, delay)
+
+    def acquire(self, hostname):
+        with self.condition:
+            while True:
+                wait = self.try_acquire(hostname)
+
+                if wait is None:
+                    return
+
+                self.condition.wait(None if wait == math.inf else wait)
+
+    def try_acquire(self, hostname):
+        """
+        Takes a request slot of a host if one is free now. Returns None if it
+        did, otherwise the seconds until the host's delay has passed, or
+        infinity while its window is full.
+        """
+
+        with self.condition:
+            state = self.host(hostname)
+            now = time.monotonic()
+
+            if state.in_flight >= int(state.window):
+                return math.inf
+
+            if now < state.next_request:
+                return state.next_request - now
+
+            state.in_flight += 1
+            state.requests += 1
+            state.next_request = now + state.min_delay
+
+            return None
+
+    def release(self, hostname, latency, status=None, retry_after=None):
+        with self.condition:
+            state = self.hosts[hostname]
+            state.in_flight -= 1
+            now = time.monotonic()
+
+            if state.average_latency is None:
+                state.average_latency = latency
+            else:
+                state.average_latency += self.smoothing * (
+                    latency - state.average_latency
+                )
+
+            throttled = status in THROTTLE_STATUSES
+
+            if throttled:
+                state.throttle_events += 1
+
+                if retry_after is not None:
+                    state.next_request = max(state.next_request, now + retry_after)
+
+            if throttled or status is None or latency > self.target_latency:
+                # only back off once per round trip, a burst of slow
+                # responses to the same window is one congestion signal
+                if now - state.last_decrease >= state.average_latency:
+                    state.window = max(1.0, state.window * self.backoff)
+                    state.last_decrease = now
+            else:
+                state.window = min(
+                    float(self.max_in_flight), state.window + 1.0 / state.window
+                )
+
+            self.condition.notify_all()
+
+    def get(self, url, content_types=None, stream_above=None):
+        hostname = urlsplit(url).netloc
+        self.acquire(hostname)
+        start = time.monotonic()
+
+        try:
+            response = self.client.get(url, content_types, stream_above)
+        except Exception:
+            self.release(hostname, time.monotonic() - start)
+            raise
+
+        self.release(
+            hostname,
+            time.monotonic() - start,
+            response.status,
+            parse_retry_after(response.headers.get("retry-after")),
+        )
+
+        return response
+
+    def stream(self, url, chunk_size=64 * 1024):
+        return self.client.stream(url, chunk_size)
+
+    def state(self):
+        with self.condition:
+            return {host: state.report() for host, state in self.hosts.items()}
+
+    def stats(self):
+        stats = self.client.stats()
+        stats["hosts"] = self.state()
+
+        return stats
@@ -0,0 +1,337 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from multiprocessing.managers import BaseManager
+from urllib.parse import urlsplit
+
+from .http import Http
+from .http import HttpCache
+from .http import http
+from .page import Page
+from .scheduler import parse_retry_after
+from .stemmer import start_worker
+from .stemmer import stem_stats
+
+
+def shard_of(url, shards):
+    """
+    Returns the shard a url belongs to. This has to be stable across
+    processes and machines, so it can not use hash().
+    """
+
+    digest = hashlib.sha1(url.encode("utf-8")).digest()
+
+    return int.from_bytes(digest[:8], "big") % shards
+
+
+class WorkerManager(BaseManager):
+    pass
+
+
+WorkerManager.register("tasks")
+WorkerManager.register("results")
+WorkerManager.register("config")
+
+
+def client_config(client):
+    """
+    Returns what a worker needs to build an Http client configured like
+    ``client``, or None for a client it does not know how to rebuild
+    """
+
+    options = getattr(client, "options", None)
+
+    if options is None:
+        return None
+
+    cache = client.cache
+
+    return {
+        "options": options,
+        "cache": None if cache is None else (cache.path, cache.max_bytes),
+    }
+
+
+def build_client(config):
+    if config is None:
+        return http
+
+    cache = config["cache"]
+
+    return Http(cache=HttpCache(*cache) if cache else None, **config["options"])
+
+
+class FetchRecorder:
+    """
+    Wraps an Http client in a worker, remembering how the last request went
+    so the coordinator's HostScheduler can adapt to it
+    """
+
+    def __init__(self, client):
+        self.client = client
+        # (latency, status, retry_after), status None if the request failed
+        self.last = (0.0, None, None)
+
+    def get(self, url, content_types=None, stream_above=None):
+        start = time.monotonic()
+
+        try:
+            response = self.client.get(url, content_types, stream_above)
+        except Exception:
+            self.last = (time.monotonic() - start, None, None)
+            raise
+
+        self.last = (
+            time.monotonic() - start,
+            response.status,
+            parse_retry_after(response.headers.get("retry-after")),
+        )
+
+        return response
+
+    def stream(self, url, chunk_size=64 * 1024):
+        return self.client.stream(url, chunk_size)
+
+
+def run_worker(address, authkey, shard):
+    """
+    Connects to a coordinator, then analyzes the urls of one shard until the
+    coordinator sends None
+    """
+
+    manager = WorkerManager(address=address, authkey=authkey)
+    manager.connect()
+
+    tasks = manager.tasks(shard)
+    results = manager.results()
+    config = manager.config().copy()
+    client = FetchRecorder(build_client(config.pop("http")))
+    start_worker(config.pop("stem_table"))
+
+    while True:
+        task = tasks.get()
+
+        if task is None:
+            break
+
+        url, depth = task
+        client.last = (0.0, None, None)
+
+        try:
+            page = Page(url=url, depth=depth, **config)
+            raw_html = page.fetch(client)
+
+            if raw_html is not None:
+                page.analyze(raw_html)
+        except Exception as e:
+            results.put((url, None, f"{url}: {e}", client.last, stem_stats()))
+            continue
+
+        results.put((url, page, None, client.last, stem_stats()))
+
+
+class ShardCoordinator:
+    """
+    Runs a Website crawl across several worker processes.
+
+    The coordinator owns the frontier, the aggregates and the politeness of
+    every host. Urls are sent to the worker owning their shard through
+    queues served over a multiprocessing manager socket, so workers can run
+    on other machines by connecting to ``address`` with the same
+    ``authkey``. Every analyzed page
+    comes back to the coordinator, which merges it into the site exactly as
+    a single process crawl would.
+    """
+
+    def __init__(
+        self,
+        site,
+        shards,
+        address=("127.0.0.1", 0),
+        authkey=None,
+        spawn_workers=True,
+        queue_size=8,
+    ):
+        self.site = site
+        self.shards = shards
+        self.address = address
+        self.authkey = authkey or os.urandom(16)
+        self.spawn_workers = spawn_workers
+        self.queue_size = queue_size
+        self.tasks = [queue.Queue() for _ in range(shards)]
+        self.results = queue.Queue()
+        self.config = {
+            "base_domain": site.base_url,
+            "analyze_headings": site.analyze_headings,
+            "analyze_extra_tags": site.analyze_extra_tags,
+            "stream_threshold": site.stream_threshold,
+            "rules": site.rules,
+            "disabled_rules": site.disabled_rules,
+            "stem_table": site.stem_table,
+            "text_engine": site.text_engine,
+            "near_duplicates": site.near_duplicate_index is not None,
+            "http": client_config(site.http.client),
+        }
+        self.pages_per_shard = [0] * shards
+
+    def serve(self):
+        """
+        Starts serving the queues and returns the address workers connect to
+        """
+
+        class CoordinatorManager(BaseManager):
+            pass
+
+        CoordinatorManager.register("tasks", callable=lambda shard: self.tasks[shard])
+        CoordinatorManager.register("results", callable=lambda: self.results)
+        CoordinatorManager.register("config", callable=lambda: self.config)
+
+        def serve_forever():
+            # the server calls sys.exit() once stop_event is set
+            try:
+                self.server.serve_forever()
+            except SystemExit:
+                pass
+
+        manager = CoordinatorManager(address=self.address, authkey=self.authkey)
+        self.server = manager.get_server()
+        threading.Thread(target=serve_forever, daemon=True).start()
+
+        return self.server.address
+
+    def run(self):
+        address = self.serve()
+        workers = []
+
+        if self.spawn_workers:
+            for shard in range(self.shards):
+                worker = multiprocessing.Process(
+                    target=run_worker, args=(address, self.authkey, shard)
+                )
+                worker.start()
+                workers.append(worker)
+
+        try:
+            self.crawl(workers)
+        finally:
+            for tasks in self.tasks:
+                tasks.put(None)
+
+            for worker in workers:
+                worker.join()
+
+            self.server.stop_event.set()
+
+    def crawl(self, workers=()):
+        """
+        Hands the frontier out to the workers. Every request still goes
+        through the site's HostScheduler here: a url is only sent once its
+        host has a free slot in its window and its delay has passed since
+        the last url of the host was sent, and the slot is given back when
+        the page returns. However many shards fetch from a host, it gets no
+        more requests in flight than a single process crawl would send it.
+        """
+
+        site = self.site
+        max_outstanding = self.shards * self.queue_size
+        outstanding = 0
+        per_shard = [0] * self.shards
+        # a page waiting for its host, and how long for
+        held = None
+        wait = None
+
+        while True:
+            while (
+                (held is not None or site.page_queue)
+                and outstanding < max_outstanding
+                and not site.budget_exhausted(outstanding)
+            ):
+                page = held if held is not None else site.next_page()
+
+                if page is None:
+                    break
+
+                wait = site.http.try_acquire(page.parsed_url.netloc)
+
+                if wait is not None:
+                    held = page
+                    break
+
+                held = None
+                shard = shard_of(page.url, self.shards)
+                self.tasks[shard].put((page.url, page.depth))
+                self.pages_per_shard[shard] += 1
+                per_shard[shard] += 1
+                outstanding += 1
+
+            if not outstanding:
+                if held is None:
+                    break
+
+                # nothing in flight, so only the host's delay is left
+                time.sleep(wait)
+                continue
+
+            timeout = 1.0 if held is None else min(wait, 1.0)
+
+            try:
+                url, page, error, fetch, stemming = self.results.get(timeout=timeout)
+            except queue.Empty:
+                self.check_workers(workers, per_shard)
+                continue
+
+            shard = shard_of(url, self.shards)
+            outstanding -= 1
+            per_shard[shard] -= 1
+            site.http.release(urlsplit(url).netloc, *fetch)
+            site.record_stemming(("shard", shard), stemming)
+
+            if error is not None:
+                site.errors.append(error)
+            else:
+                site.add_page(page)
+
+            self.check_workers(workers, per_shard)
+
+    def check_workers(self, workers, per_shard):
+        """
+        Raises if a worker exited while urls of its shard were outstanding,
+        they would never come back
+        """
+
+        for shard, worker in enumerate(workers):
+            if per_shard[shard] and not worker.is_alive():
+                raise RuntimeError(
+                    f"Crawl worker {shard} exited with {per_shard[shard]} urls outstanding"
+                )
+
+    def stats(self):
+        return {
+            "shards": self.shards,
+            "pages_per_shard": self.pages_per_shard,
+        }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description="Run a crawl worker for a sharded seoanalyze coordinator."
+    )
+    arg_parser.add_argument("address", help="host:port of the coordinator.")
+    arg_parser.add_argument("shard", type=int, help="Shard number to work on.")
+    arg_parser.add_argument(
+        "--authkey", required=True, help="Shared secret of the coordinator."
+    )
+
+    args = arg_parser.parse_args()
+    host, _, port = args.address.rpartition(":")
+
+    run_worker((host, int(port)), args.authkey.encode("utf-8"), args.shard)
+
+
+if __name__ == "__main__":
+    main()
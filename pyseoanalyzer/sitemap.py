@@ -0,0 +1,224 @@
+import queue
+import threading
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from lxml import etree
+
+from .http import http
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+# Marks the end of the entries coming from one worker
+DONE = object()
+
+
+def decompress(chunks):
+    """
+    Passes chunks through, gunzipping them on the fly if the body starts
+    with the gzip magic number
+    """
+
+    head = b""
+    chunks = iter(chunks)
+
+    for chunk in chunks:
+        head += chunk
+        if len(head) >= len(GZIP_MAGIC):
+            break
+
+    if not head.startswith(GZIP_MAGIC):
+        yield head
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.decompress(head)
+
+    for chunk in chunks:
+        yield decompressor.decompress(chunk)
+
+    yield decompressor.flush()
+
+
+def localname(element):
+    return etree.QName(element).localname
+
+
+def parse_xml(head, chunks):
+    """
+    Yields ``(kind, loc, lastmod)`` from an XML sitemap or sitemap index
+    without keeping the document in memory
+    """
+
+    parser = etree.XMLPullParser(
+        events=("start", "end"), resolve_entities=False, no_network=True
+    )
+    kind = None
+    loc = None
+    lastmod = None
+
+    for chunk in chain((head,), chunks):
+        parser.feed(chunk)
+
+        for event, element in parser.read_events():
+            name = localname(element)
+
+            if event == "start":
+                if kind is None:
+                    kind = "sitemap" if name == "sitemapindex" else "url"
+                continue
+
+            parent = element.getparent()
+
+            if parent is None:
+                continue
+
+            if name in ("loc", "lastmod") and localname(parent) in ("url", "sitemap"):
+                if name == "loc":
+                    loc = (element.text or "").strip()
+                else:
+                    lastmod = (element.text or "").strip() or None
+            elif name in ("url", "sitemap"):
+                if loc:
+                    yield kind, loc, lastmod
+
+                loc = None
+                lastmod = None
+
+                # drop everything parsed so far so memory stays flat
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    parser.close()
+
+
+def parse_text(head, chunks):
+    """
+    Yields ``("url", loc, None)`` for every line of a plain text sitemap
+    """
+
+    rest = b""
+
+    for chunk in chain((head,), chunks):
+        lines = (rest + chunk).split(b"\n")
+        rest = lines.pop()
+
+        for line in lines:
+            line = line.strip().decode("utf-8", "replace")
+            if line:
+                yield "url", line, None
+
+    line = rest.strip().decode("utf-8", "replace")
+    if line:
+        yield "url", line, None
+
+
+def parse_sitemap(chunks):
+    """
+    Detects from its content whether a (possibly gzipped) sitemap is XML or
+    plain text and yields its ``(kind, loc, lastmod)`` entries
+    """
+
+    chunks = decompress(chunks)
+    head = b""
+
+    for chunk in chunks:
+        head += chunk
+        if head.lstrip(b"\xef\xbb\xbf \t\r\n"):
+            break
+
+    if head.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"<"):
+        return parse_xml(head, chunks)
+
+    return parse_text(head, chunks)
+
+
+class SitemapReader:
+    """
+    Streams the urls out of a sitemap.
+
+    Sitemap indexes are followed recursively, with up to ``max_workers``
+    child sitemaps fetched at once. At most ``queue_size`` urls read by the
+    workers wait to be consumed, so memory use does not grow with the size
+    of the sitemap.
+    """
+
+    def __init__(self, client=None, max_workers=4, queue_size=1000):
+        self.client = client or http
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.errors = []
+
+    def entries(self, url):
+        return parse_sitemap(self.client.stream(url))
+
+    def read(self, url):
+        """
+        Yields ``(loc, lastmod)`` for every page listed under the sitemap.
+        Sitemaps that can not be fetched or parsed, the root included, are
+        listed in ``errors`` instead of raising.
+        """
+
+        results = queue.Queue(self.queue_size)
+        stopped = threading.Event()
+        submitted = 0
+
+        def put(item):
+            while not stopped.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+
+            return False
+
+        def collect(child):
+            try:
+                for kind, loc, lastmod in self.entries(child):
+                    if kind == "sitemap":
+                        collect(loc)
+                    elif not put((loc, lastmod)):
+                        return
+            except Exception as e:
+                self.errors.append(f"{child}: {e}")
+
+        def work(child):
+            try:
+                collect(child)
+            finally:
+                put(DONE)
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        futures = []
+
+        try:
+            try:
+                for kind, loc, lastmod in self.entries(url):
+                    if kind == "sitemap":
+                        futures.append(executor.submit(work, loc))
+                        submitted += 1
+                    else:
+                        yield loc, lastmod
+            except Exception as e:
+                # like a child, whatever was read before the error is kept
+                self.errors.append(f"{url}: {e}")
+
+            while submitted:
+                item = results.get()
+
+                if item is DONE:
+                    submitted -= 1
+                else:
+                    yield item
+        finally:
+            stopped.set()
+
+            # shutdown(cancel_futures=True) needs python 3.9
+            for future in futures:
+                future.cancel()
+
+            executor.shutdown(wait=False)
@@ -0,0 +1,156 @@
+import hashlib
+import heapq
+
+from array import array
+
+
+class CountMinSketch:
+    """
+    Estimates the count of any key from ``depth`` rows of ``width``
+    counters. An estimate is never too low, and is too high by more than
+    e * total / width with a probability of at most exp(-depth).
+    """
+
+    def __init__(self, width, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+
+    def cells(self, key):
+        # two halves of one stable hash give every row its own cell
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        step = int.from_bytes(digest[8:], "little") | 1
+
+        return [(first + i * step) % self.width for i in range(self.depth)]
+
+    def add(self, key, count=1):
+        """
+        Adds to the count of a key and returns its new estimate
+        """
+
+        estimate = None
+
+        for row, cell in zip(self.rows, self.cells(key)):
+            row[cell] += count
+
+            if estimate is None or row[cell] < estimate:
+                estimate = row[cell]
+
+        return estimate
+
+
+class SpaceSaving:
+    """
+    Counts the most frequent keys in at most ``capacity`` counters, using
+    the weighted Space-Saving algorithm. Once every counter is taken, a new
+    key replaces the key with the smallest count. The new key starts from
+    the largest count replaced so far, which is recorded as its possible
+    error. With ``total`` the sum of all counts added:
+
+    * every key counted more than total / capacity times is kept
+    * a kept count is never too low, and too high by at most its error,
+      which is at most total / capacity
+    * until the first key is replaced, every count is exact
+
+    With ``sketch_width`` set, a CountMinSketch also estimates the keys
+    that are not kept. A new key then starts from the lower of the two
+    estimates.
+    """
+
+    def __init__(self, capacity, sketch_width=0, sketch_depth=4):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # one (count, key) entry per kept key, the count may be outdated
+        self.heap = []
+        self.total = 0
+        self.replaced = 0
+        # no key that is not kept has been counted more often than this
+        self.floor = 0
+        self.sketch = None
+
+        if sketch_width:
+            self.sketch = CountMinSketch(sketch_width, sketch_depth)
+
+    def add(self, key, count=1):
+        self.total += count
+        counts = self.counts
+        estimate = None
+
+        if self.sketch is not None:
+            estimate = self.sketch.add(key, count)
+
+        if key in counts:
+            counts[key] += count
+            return
+
+        if len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+            heapq.heappush(self.heap, (count, key))
+            return
+
+        smallest, replaced = self.pop_smallest()
+        del counts[replaced]
+        del self.errors[replaced]
+        self.replaced += 1
+        self.floor = max(self.floor, smallest)
+
+        new_count = self.floor + count
+
+        if estimate is not None and estimate < new_count:
+            new_count = estimate
+
+        counts[key] = new_count
+        self.errors[key] = new_count - count
+        heapq.heappush(self.heap, (new_count, key))
+
+    def pop_smallest(self):
+        heap = self.heap
+
+        while True:
+            count, key = heapq.heappop(heap)
+            current = self.counts[key]
+
+            if current == count:
+                return count, key
+
+            # counts only grow, so an outdated entry just moves down the heap
+            heapq.heappush(heap, (current, key))
+
+    def update(self, counts):
+        """
+        Adds the counts of a mapping, like Counter.update()
+        """
+
+        for key, count in counts.items():
+            self.add(key, count)
+
+    def items(self):
+        return self.counts.items()
+
+    def __getitem__(self, key):
+        return self.counts.get(key, 0)
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __eq__(self, other):
+        if isinstance(other, SpaceSaving):
+            return self.counts == other.counts
+
+        return NotImplemented
+
+    def stats(self):
+        return {
+            "capacity": self.capacity,
+            "kept": len(self.counts),
+            "total": self.total,
+            "replaced": self.replaced,
+            "max_error": max(self.errors.values(), default=0),
+            "error_bound": self.total / self.capacity if self.replaced else 0,
+        }
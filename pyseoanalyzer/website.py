@@ -1,99 +1,673 @@
 from collections import Counter
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlsplit
-from xml.dom import minidom
 
-import socket
+import asyncio
+import os
+import time
 
+from .checkpoint import CheckpointStore
+from .duplicates import NearDuplicateIndex
+from .frontier import Frontier
+from .frontier import normalize_url
 from .http import http
+from .keywords import KeywordIndex
+from .ngrams import NgramTable
+from .ngrams import Vocabulary
+from .ngrams import check_text_engine
 from .page import Page
+from .page import STREAM_THRESHOLD
+from .resolver import resolver
+from .robots import RobotsCache
+from .rules import compile_rules
+from .results import ResultStore
+from .results import options_key
+from .scheduler import HostScheduler
+from .shard import ShardCoordinator
+from .sitemap import SitemapReader
+from .stemmer import add_stem_stats
+from .stemmer import load_stem_table
+from .stemmer import start_worker
+from .stemmer import stem_stats
+from .topk import SpaceSaving
 
 
 class Website:
     def __init__(
-        self, base_url, sitemap, analyze_headings, analyze_extra_tags, follow_links
+        self,
+        base_url,
+        sitemap,
+        analyze_headings,
+        analyze_extra_tags,
+        follow_links,
+        concurrency=1,
+        concurrency_per_host=None,
+        analyze_workers=0,
+        queue_size=None,
+        resume=None,
+        checkpoint_interval=500,
+        http_client=None,
+        result_store=None,
+        delay=0.0,
+        max_pages=None,
+        max_depth=None,
+        deadline=None,
+        shards=0,
+        shard_address=None,
+        shard_authkey=None,
+        respect_robots=True,
+        stream_threshold=STREAM_THRESHOLD,
+        rules=None,
+        disabled_rules=(),
+        stem_table=None,
+        text_engine="python",
+        keyword_counters=None,
+        keyword_sketch=False,
+        keyword_scoring=None,
+        near_duplicates=None,
     ):
-        self.base_url = base_url
+        self.base_url = normalize_url(base_url)
         self.sitemap = sitemap
         self.analyze_headings = analyze_headings
         self.analyze_extra_tags = analyze_extra_tags
         self.follow_links = follow_links
+        self.concurrency = max(1, concurrency)
+        self.concurrency_per_host = concurrency_per_host or self.concurrency
+        self.analyze_workers = analyze_workers
+        self.queue_size = queue_size or max(self.concurrency, analyze_workers) * 2
+        self.max_pages = max_pages if follow_links else 1
+        self.max_depth = max_depth
+        self.deadline = deadline
+        self.deadline_at = None
+        self.stop_reason = None
+        self.stream_threshold = stream_threshold
+        self.rules = None if rules is None else tuple(rules)
+        self.disabled_rules = tuple(disabled_rules)
+        # compiled once here so unknown rule names fail before crawling
+        self.rule_names = compile_rules(
+            self.rules, self.disabled_rules, analyze_headings, analyze_extra_tags
+        ).names
+        self.rule_times = Counter()
+        self.stem_table = stem_table
+        self.text_engine = text_engine
+        self.keyword_counters = keyword_counters
+        self.keyword_index = None
+
+        if keyword_scoring:
+            self.keyword_index = KeywordIndex(keyword_scoring)
+
+        self.near_duplicate_index = None
+
+        if near_duplicates:
+            self.near_duplicate_index = NearDuplicateIndex(near_duplicates)
+
+        self.shards = shards
+        self.shard_address = shard_address
+        self.shard_authkey = shard_authkey
+        self.coordinator = None
         self.crawled_pages = []
         self.crawled_urls = set([])
-        self.page_queue = []
+        self.page_queue = Frontier()
         self.wordcount = Counter()
         self.bigrams = Counter()
         self.trigrams = Counter()
+
+        check_text_engine(text_engine)
+
+        if text_engine == "numpy":
+            if keyword_counters:
+                raise ValueError(
+                    "keyword_counters can not be used with the numpy text engine"
+                )
+
+            vocabulary = Vocabulary()
+            self.bigrams = NgramTable(2, vocabulary)
+            self.trigrams = NgramTable(3, vocabulary)
+
+        if keyword_counters:
+            # a count-min sketch of 4 x 4 cells per counter when asked for
+            sketch_width = 4 * keyword_counters if keyword_sketch else 0
+            self.wordcount = SpaceSaving(keyword_counters, sketch_width)
+            self.bigrams = SpaceSaving(keyword_counters, sketch_width)
+            self.trigrams = SpaceSaving(keyword_counters, sketch_width)
+
         self.content_hashes = defaultdict(set)
+        self.errors = []
+        self.resolver = getattr(http_client or http, "resolver", None) or resolver
+        self.known_hosts = set()
+        self.http = HostScheduler(
+            http_client or http,
+            min_delay=delay,
+            max_in_flight=self.concurrency_per_host,
+        )
+        self.store = None
+        self.results = None
+        self.reused_pages = 0
+        self.robots = RobotsCache(self.http) if respect_robots else None
+        self.robots_skipped = set()
+        self.redirects = {}
+        self.short_circuited_redirects = 0
+        # the latest stem_stats() of every worker process, by worker
+        self.worker_stemming = {}
+
+        if stem_table:
+            load_stem_table(stem_table)
+
+        if result_store:
+            self.results = ResultStore(result_store)
+
+        if resume:
+            self.store = CheckpointStore(resume, checkpoint_interval)
+            self.page_queue = self.store.frontier
 
     def check_dns(self, url_to_check):
         try:
             o = urlsplit(url_to_check)
-            socket.gethostbyname(o.hostname)
+            self.resolver.resolve(o.hostname)
             return True
         except:
             pass
 
         return False
 
-    def get_text_from_xml(self, nodelist):
+    def prefetch_host(self, url):
         """
-        Stolen from the minidom documentation
+        Starts resolving the host of a newly queued url in the background
         """
-        rc = []
 
-        for node in nodelist:
-            if node.nodeType == node.TEXT_NODE:
-                rc.append(node.data)
+        host = urlsplit(url).hostname
 
-        return "".join(rc)
+        if host and host not in self.known_hosts:
+            self.known_hosts.add(host)
+            self.resolver.prefetch([host])
+
+    def seed(self):
+        """
+        Fills the page queue with the sitemap urls and the base url
+        """
 
-    def crawl(self):
         if self.sitemap:
-            page = http.get(self.sitemap)
-            if self.sitemap.endswith("xml"):
-                xmldoc = minidom.parseString(page.data.decode("utf-8"))
-                sitemap_urls = xmldoc.getElementsByTagName("loc")
-                for url in sitemap_urls:
-                    self.page_queue.append(self.get_text_from_xml(url.childNodes))
-            elif self.sitemap.endswith("txt"):
-                sitemap_urls = page.data.decode("utf-8").split("\n")
-                for url in sitemap_urls:
-                    self.page_queue.append(url)
-
-        self.page_queue.append(self.base_url)
-
-        for url in self.page_queue:
+            reader = SitemapReader(self.http)
+
+            for url, lastmod in reader.read(self.sitemap):
+                self.queue_url(url)
+
+            # child sitemaps that could not be read only show up here
+            self.errors.extend(reader.errors)
+
+        if self.queue_url(self.base_url):
+            self.prefetch_host(self.base_url)
+
+    def queue_url(self, url, priority=0, depth=0):
+        """
+        Pushes a url onto the frontier unless robots.txt disallows it,
+        replacing known redirect sources by where they lead. Returns True if
+        it was queued.
+        """
+
+        if url in self.page_queue:
+            return self.page_queue.push(url, priority, depth)
+
+        url = normalize_url(url)
+
+        if url in self.redirects:
+            # known to redirect to a page that has already been queued
+            self.short_circuited_redirects += 1
+            url = self.redirects[url]
+
+        if self.robots is not None:
+            if url in self.robots_skipped:
+                return False
+
+            # other sites are never crawled, so their robots.txt does not matter
+            if urlsplit(url).netloc == urlsplit(self.base_url).netloc:
+                if not self.robots.allowed(url):
+                    self.robots_skipped.add(url)
+                    return False
+
+        return self.page_queue.push(url, priority, depth)
+
+    def new_page(self, url, depth=0):
+        """
+        Returns a Page for the url, or None if it is not part of this site
+        """
+
+        page = Page(
+            url=url,
+            base_domain=self.base_url,
+            analyze_headings=self.analyze_headings,
+            analyze_extra_tags=self.analyze_extra_tags,
+            depth=depth,
+            stream_threshold=self.stream_threshold,
+            rules=self.rules,
+            disabled_rules=self.disabled_rules,
+            text_engine=self.text_engine,
+            near_duplicates=self.near_duplicate_index is not None,
+        )
+
+        if page.parsed_url.netloc != page.base_domain.netloc:
+            return None
+
+        return page
+
+    def next_page(self):
+        """
+        Returns a Page for the next url in the frontier that is part of this
+        site, or None once the frontier is empty
+        """
+
+        while self.page_queue:
+            url, depth = self.page_queue.pop()
+
             if url in self.crawled_urls:
                 continue
 
-            page = Page(
-                url=url,
-                base_domain=self.base_url,
-                analyze_headings=self.analyze_headings,
-                analyze_extra_tags=self.analyze_extra_tags,
-            )
+            page = self.new_page(url, depth)
 
-            if page.parsed_url.netloc != page.base_domain.netloc:
-                continue
+            if page is not None:
+                return page
+
+        return None
+
+    def budget_exhausted(self, in_flight=0):
+        """
+        True (and records why) once max_pages or the deadline stop the crawl
+        """
+
+        if (
+            self.max_pages is not None
+            and len(self.crawled_pages) + in_flight >= self.max_pages
+        ):
+            self.stop_reason = "max_pages"
+        elif self.deadline_at is not None and time.monotonic() >= self.deadline_at:
+            self.stop_reason = "deadline"
+        else:
+            return False
+
+        return True
+
+    def reuse_analysis(self, page, raw_html):
+        """
+        Restores a stored analysis if the page has not changed since it was
+        saved, returns True if it did
+        """
 
-            page.analyze()
+        if self.results is None:
+            return False
 
-            self.content_hashes[page.content_hash].add(page.url)
+        page.hash_content(raw_html)
+        state = self.results.get(
+            page.url,
+            page.content_hash,
+            options_key(
+                self.analyze_headings,
+                self.analyze_extra_tags,
+                self.rule_names,
+                self.text_engine,
+                self.near_duplicate_index is not None,
+            ),
+        )
 
-            for w in page.wordcount:
-                self.wordcount[w] += page.wordcount[w]
+        if state is None:
+            return False
 
-            for b in page.bigrams:
-                self.bigrams[b] += page.bigrams[b]
+        page.restore_analysis(state)
+        self.reused_pages += 1
 
-            for t in page.trigrams:
-                self.trigrams[t] += page.trigrams[t]
+        return True
 
-            self.page_queue.extend(page.links)
+    def save_analysis(self, page):
+        if self.results is not None and page.content_hash is not None:
+            self.results.put(
+                page,
+                options_key(
+                    self.analyze_headings,
+                    self.analyze_extra_tags,
+                    self.rule_names,
+                    self.text_engine,
+                    self.near_duplicate_index is not None,
+                ),
+            )
+
+    def aggregates(self):
+        return (self.wordcount, self.bigrams, self.trigrams, self.content_hashes)
+
+    def restore(self):
+        """
+        Loads the pages, frontier and aggregates saved by an interrupted crawl
+        """
 
+        pages, aggregates, newer_pages = self.store.load()
+
+        if aggregates is not None:
+            self.wordcount, self.bigrams, self.trigrams, self.content_hashes = (
+                aggregates
+            )
+
+        for page in newer_pages:
+            self.merge(page)
+
+        for page in pages:
             self.crawled_pages.append(page)
             self.crawled_urls.add(page.url)
+            self.crawled_urls.add(final_url(page))
+            self.record_redirects(page)
+            self.index_keywords(page)
+            self.index_fingerprint(page)
+
+    def add_page(self, page):
+        """
+        Records an analyzed page and queues the links found on it
+        """
+
+        self.record_redirects(page)
+
+        if self.already_crawled(page):
+            # only the url it was reached by is new, the page has been counted
+            self.crawled_urls.add(page.url)
+            return
+
+        self.merge(page)
+        self.index_keywords(page)
+        self.index_fingerprint(page)
+
+        if self.max_depth is None or page.depth < self.max_depth:
+            depth = page.depth + 1
+
+            for link in page.links:
+                if self.queue_url(link, depth, depth):
+                    self.prefetch_host(link)
+
+        self.crawled_pages.append(page)
+        self.crawled_urls.add(page.url)
+        self.crawled_urls.add(final_url(page))
+
+        if self.store is not None:
+            self.store.save_page(page, self.aggregates())
+
+    def already_crawled(self, page):
+        """
+        True if the url a page ended up at has been crawled already, e.g.
+        through a redirect fetched at the same time
+        """
+
+        return final_url(page) in self.crawled_urls
+
+    def record_redirects(self, page):
+        """
+        Remembers where the redirects a page went through lead, so links to
+        any url of the chain are not fetched again
+        """
+
+        if not page.redirects:
+            return
+
+        target = final_url(page)
 
-            if not self.follow_links:
+        for source, status, location in page.redirects:
+            self.redirects[normalize_url(source)] = target
+
+        self.page_queue.mark_seen(target)
+
+    def index_keywords(self, page):
+        """
+        Adds a page with text to the keyword index, if there is one
+        """
+
+        if self.keyword_index is not None and page.total_word_count:
+            self.keyword_index.add(page)
+
+    def index_fingerprint(self, page):
+        """
+        Adds the fingerprint of a page with text to the near duplicate
+        index, if there is one
+        """
+
+        if self.near_duplicate_index is not None and page.fingerprint is not None:
+            self.near_duplicate_index.add(page.url, page.fingerprint)
+
+    def merge(self, page):
+        """
+        Merges an analyzed page into the site-wide aggregates
+        """
+
+        self.content_hashes[page.content_hash].add(page.url)
+
+        self.wordcount.update(page.wordcount)
+
+        if self.text_engine == "numpy":
+            self.bigrams.add(page.bigrams)
+            self.trigrams.add(page.trigrams)
+        else:
+            self.bigrams.update(page.bigrams)
+            self.trigrams.update(page.trigrams)
+
+        for rule, seconds in page.rule_times.items():
+            self.rule_times[rule] += seconds
+
+    def record_stemming(self, worker, stemming):
+        """
+        Keeps the stem_stats() a worker process sent along with a page. They
+        only grow, so the largest is the latest.
+        """
+
+        latest = self.worker_stemming.get(worker)
+
+        if latest is None or stemming["calls"] >= latest["calls"]:
+            self.worker_stemming[worker] = stemming
+
+    def stats(self):
+        """
+        Returns counters describing the crawl itself
+        """
+
+        stats = self.page_queue.stats()
+        stats["stop_reason"] = self.stop_reason
+        stats.update(self.http.stats())
+
+        stats["redirects"] = {
+            "sources": len(self.redirects),
+            "short_circuited": self.short_circuited_redirects,
+        }
+
+        stats["rule_cpu_time"] = {
+            rule: self.rule_times[rule] for rule in self.rule_names
+        }
+        stats["stemming"] = add_stem_stats(
+            [stem_stats(), *self.worker_stemming.values()]
+        )
+
+        if self.keyword_counters:
+            stats["keyword_counters"] = {
+                "words": self.wordcount.stats(),
+                "bigrams": self.bigrams.stats(),
+                "trigrams": self.trigrams.stats(),
+            }
+
+        if self.near_duplicate_index is not None:
+            stats["near_duplicates"] = self.near_duplicate_index.stats()
+
+        if self.robots is not None:
+            stats["robots"] = self.robots.stats()
+            stats["robots"]["skipped_urls"] = len(self.robots_skipped)
+
+        if self.coordinator is not None:
+            stats["sharding"] = self.coordinator.stats()
+
+        if self.results is not None:
+            stats["reused_pages"] = self.reused_pages
+            stats["result_store"] = self.results.stats()
+
+        return stats
+
+    def crawl(self):
+        if self.deadline is not None:
+            self.deadline_at = time.monotonic() + self.deadline
+
+        if self.store is not None and self.store.resumable():
+            self.restore()
+        else:
+            self.seed()
+
+            if self.store is not None:
+                self.store.flush()
+
+        try:
+            self.crawl_pages()
+        finally:
+            if self.store is not None:
+                self.store.snapshot(self.aggregates())
+                self.store.close()
+            if self.results is not None:
+                self.results.close()
+
+    def crawl_pages(self):
+        if self.shards:
+            self.coordinator = ShardCoordinator(
+                self,
+                self.shards,
+                address=self.shard_address or ("127.0.0.1", 0),
+                authkey=self.shard_authkey,
+                spawn_workers=self.shard_address is None,
+            )
+            self.coordinator.run()
+            return
+
+        if self.concurrency > 1 or self.analyze_workers:
+            asyncio.run(self.crawl_async())
+            return
+
+        while self.page_queue and not self.budget_exhausted():
+            page = self.next_page()
+
+            if page is None:
                 break
+
+            raw_html = page.fetch(self.http)
+
+            if self.already_crawled(page):
+                raw_html = None
+
+            if raw_html is not None and not self.reuse_analysis(page, raw_html):
+                page.analyze(raw_html)
+                self.save_analysis(page)
+
+            self.add_page(page)
+
+    async def crawl_async(self):
+        """
+        Crawls with up to ``concurrency`` fetches in flight at once, and at
+        most ``concurrency_per_host`` of those against any single host.
+
+        Pages are fetched on a thread pool. With ``analyze_workers`` set the
+        downloaded html is handed to a process pool for analysis, otherwise
+        it is analyzed on the fetching thread. At most ``queue_size`` bodies
+        wait for or sit in analysis at once; when that fills up fetching
+        stops until the analyzers catch up. Results are merged back on the
+        event loop so the aggregates are only touched from one thread.
+        """
+
+        loop = asyncio.get_running_loop()
+        host_limits = defaultdict(lambda: asyncio.Semaphore(self.concurrency_per_host))
+        analyze_slots = asyncio.Semaphore(self.queue_size)
+        max_pending = self.concurrency + self.queue_size
+        pending = set()
+
+        async def run(page):
+            async with host_limits[page.parsed_url.netloc]:
+                raw_html = await loop.run_in_executor(
+                    fetch_executor, page.fetch, self.http
+                )
+
+            if (
+                raw_html is None
+                or self.already_crawled(page)
+                or self.reuse_analysis(page, raw_html)
+            ):
+                return page
+
+            async with analyze_slots:
+                if analyze_executor is None:
+                    page = await loop.run_in_executor(
+                        fetch_executor, analyze_page, page, raw_html
+                    )
+                else:
+                    page, worker, stemming = await loop.run_in_executor(
+                        analyze_executor, analyze_in_worker, page, raw_html
+                    )
+                    self.record_stemming(worker, stemming)
+
+            self.save_analysis(page)
+
+            return page
+
+        fetch_executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        analyze_executor = None
+
+        if self.analyze_workers:
+            analyze_executor = ProcessPoolExecutor(
+                max_workers=self.analyze_workers,
+                initializer=start_worker,
+                initargs=(self.stem_table,),
+            )
+
+        try:
+            while True:
+                while (
+                    self.page_queue
+                    and len(pending) < max_pending
+                    and not self.budget_exhausted(len(pending))
+                ):
+                    page = self.next_page()
+
+                    if page is None:
+                        break
+
+                    pending.add(asyncio.ensure_future(run(page)))
+
+                if not pending:
+                    break
+
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    self.add_page(task.result())
+        finally:
+            fetch_executor.shutdown()
+            if analyze_executor is not None:
+                analyze_executor.shutdown()
+
+
+def final_url(page):
+    """
+    Returns the url a page ended up at after its redirects
+    """
+
+    if page.redirects:
+        return normalize_url(page.redirects[-1][2])
+
+    return page.url
+
+
+def analyze_page(page, raw_html):
+    """
+    Runs the analysis of an already downloaded page. This lives at module
+    level so it can be sent to a worker process.
+    """
+
+    page.analyze(raw_html)
+
+    return page
+
+
+def analyze_in_worker(page, raw_html):
+    """
+    analyze_page() in a worker process, also returning which process it is
+    and its stem_stats()
+    """
+
+    return analyze_page(page, raw_html), os.getpid(), stem_stats()
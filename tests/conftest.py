@@ -0,0 +1,97 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+
+def html_page(title, body, links=()):
+    anchors = "".join(f'<a href="{link}" title="{link}">{link}</a>' for link in links)
+
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>{title}</title>"
+        '<meta name="description" content="A small local page used by the test suite.">'
+        "</head><body>"
+        f"<h1>{title}</h1><p>{body}</p>{anchors}"
+        "</body></html>"
+    )
+
+
+def small_site():
+    """
+    Returns a handful of interlinked pages keyed by path
+    """
+
+    paths = ["/", "/alpha", "/beta", "/gamma", "/delta"]
+    pages = {}
+
+    for i, path in enumerate(paths):
+        body = " ".join(["search engine optimization crawler"] * (i + 3))
+        pages[path] = html_page(f"Local test page {i}", body, links=paths)
+
+    return pages
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        page = self.server.pages.get(self.path)
+
+        if page is None:
+            self.send_response(404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if callable(page):
+            status, headers, body = page(self)
+        elif isinstance(page, tuple):
+            status, headers, body = page
+        else:
+            status, headers, body = 200, {}, page
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+        self.send_response(status)
+        headers = dict(headers)
+        headers.setdefault("Content-Type", "text/html; charset=utf-8")
+        headers.setdefault("Content-Length", str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    """
+    Serves a dict of ``path -> body`` (or ``(status, headers, body)``) on
+    localhost and returns the base url.
+    """
+
+    servers = []
+
+    def start(pages):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        server.daemon_threads = True
+        server.pages = pages
+        server.requests = []
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+
+        start.requests = server.requests
+
+        return f"http://127.0.0.1:{server.server_port}/"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
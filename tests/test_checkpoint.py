@@ -0,0 +1,28 @@
+from pyseoanalyzer.website import Website
+
+from .conftest import small_site
+
+
+def test_resume_does_not_refetch(serve, tmp_path):
+    base_url = serve(small_site())
+    checkpoint = str(tmp_path / "crawl.sqlite")
+
+    # a crawl that stops after the first page, as if it had been interrupted
+    first = Website(base_url, None, False, False, False, resume=checkpoint)
+    first.crawl()
+    assert len(first.crawled_pages) == 1
+
+    resumed = Website(base_url, None, False, False, True, resume=checkpoint)
+    resumed.crawl()
+
+    fresh = Website(base_url, None, False, False, True)
+    fresh.crawl()
+
+    # every page is fetched once by the resumed crawl and once by the fresh one
+    for path in small_site():
+        assert serve.requests.count(path) == 2
+
+    assert resumed.crawled_urls == fresh.crawled_urls
+    assert resumed.wordcount == fresh.wordcount
+    assert resumed.trigrams == fresh.trigrams
+    assert resumed.content_hashes == fresh.content_hashes
@@ -0,0 +1,80 @@
+import random
+
+from pyseoanalyzer import analyze
+from pyseoanalyzer.duplicates import NearDuplicateIndex
+from pyseoanalyzer.duplicates import minhash
+
+from .conftest import html_page
+
+
+def random_text(rng, size=300):
+    return [f"word{rng.randrange(5000)}" for _ in range(size)]
+
+
+def edited(rng, tokens, changes):
+    tokens = list(tokens)
+
+    for _ in range(changes):
+        tokens[rng.randrange(len(tokens))] = "changed"
+
+    return tokens
+
+
+def test_fingerprints_estimate_similarity():
+    rng = random.Random(1)
+    text = random_text(rng)
+    fingerprint = minhash(text)
+
+    assert minhash(list(text)) == fingerprint
+    assert minhash([]) is None
+
+    index = NearDuplicateIndex(0.9)
+    index.add("a", fingerprint)
+    index.add("b", minhash(edited(rng, text, 2)))
+    index.add("c", minhash(random_text(rng)))
+
+    assert index.similarity(0, 1) > 0.8
+    assert index.similarity(0, 2) < 0.1
+
+
+def test_index_clusters_without_comparing_all_pairs():
+    rng = random.Random(2)
+    index = NearDuplicateIndex(0.8)
+    expected = []
+
+    for i in range(2000):
+        text = random_text(rng)
+        index.add(f"/{i}", minhash(text))
+
+        if i % 10 == 0:
+            copies = [f"/{i}/copy{k}" for k in range(3)]
+
+            for url in copies:
+                index.add(url, minhash(edited(rng, text, 1)))
+
+            expected.append([f"/{i}"] + copies)
+
+    assert index.clusters() == expected
+    # 2600 pages, a handful of comparisons each
+    assert index.stats()["comparisons"] < 10000
+
+
+def test_analyze_reports_near_duplicates(serve):
+    article = " ".join(f"sentence number {i} of the article" for i in range(60))
+    links = ["/copy", "/other"]
+    base_url = serve(
+        {
+            "/": html_page("Article", article, links=links),
+            "/copy": html_page("Article", article + " with an edit", links=links),
+            "/other": html_page(
+                "Other", " ".join(f"something else {i}" for i in range(100))
+            ),
+        }
+    )
+
+    output = analyze(base_url, near_duplicates=0.8)
+
+    assert output["duplicate_pages"] == []
+    assert output["near_duplicate_pages"] == [[base_url, base_url + "copy"]]
+    assert output["crawl_stats"]["near_duplicates"]["pages"] == 3
+    assert "near_duplicate_pages" not in analyze(base_url)
@@ -0,0 +1,33 @@
+from pyseoanalyzer.frontier import Frontier
+from pyseoanalyzer.frontier import normalize_url
+
+
+def test_normalize_url():
+    assert normalize_url("HTTP://Example.COM:80") == "http://example.com/"
+    assert normalize_url("https://example.com:443/a#top") == "https://example.com/a"
+    assert normalize_url("https://example.com:8443/a/") == "https://example.com:8443/a/"
+    assert (
+        normalize_url("https://example.com/?b=2&a=1") == "https://example.com/?a=1&b=2"
+    )
+    assert normalize_url("/relative") == "/relative"
+
+
+def test_frontier_dedups_at_enqueue():
+    frontier = Frontier()
+
+    assert frontier.push("https://example.com/b", depth=1)
+    assert frontier.push("https://example.com/a", priority=-1)
+    assert not frontier.push("HTTPS://EXAMPLE.COM/b#footer")
+    frontier.extend(["https://example.com/c", "https://example.com/a"])
+
+    assert frontier.stats() == {
+        "frontier_size": 3,
+        "seen_urls": 3,
+        "duplicate_urls": 2,
+    }
+    assert [frontier.pop() for _ in range(len(frontier))] == [
+        ("https://example.com/a", 0),
+        ("https://example.com/b", 1),
+        ("https://example.com/c", 0),
+    ]
+    assert "https://example.com/c" in frontier
@@ -1,5 +1,158 @@
+import gzip
+
 from pyseoanalyzer import http
 
 
 def test_http():
     assert http.http.get("https://www.sethserver.com/tests/utf8.html")
+
+
+def test_cache_revalidates(serve, tmp_path):
+    body = "<html><body>cached</body></html>"
+
+    def page(handler):
+        if handler.headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"', "Content-Length": "0"}, b""
+        return 200, {"ETag": '"v1"'}, body
+
+    base_url = serve({"/": page})
+    cache_path = str(tmp_path / "cache.sqlite")
+
+    first = http.Http(cache=http.HttpCache(cache_path))
+    assert first.get(base_url).data == body.encode()
+
+    second = http.Http(cache=http.HttpCache(cache_path))
+    response = second.get(base_url)
+
+    assert response.status == 200
+    assert response.from_cache
+    assert response.data == body.encode()
+    assert second.stats()["http_cache"]["hits"] == 1
+    assert second.stats()["http_cache"]["bytes_saved"] == len(body)
+
+
+def test_cache_evicts_least_recently_used(serve, tmp_path):
+    base_url = serve({f"/{i}": (200, {"ETag": f'"{i}"'}, "x" * 100) for i in range(3)})
+    client = http.Http(cache=http.HttpCache(str(tmp_path / "c.sqlite"), max_bytes=250))
+
+    for i in range(3):
+        client.get(f"{base_url}{i}")
+
+    assert client.cache.validators(f"{base_url}0") == {}
+    assert client.cache.validators(f"{base_url}2") == {"If-None-Match": '"2"'}
+    assert client.cache.stats()["evictions"] == 1
+
+
+def test_get_skips_unwanted_media_types(serve):
+    base_url = serve(
+        {
+            "/page": (200, {"Content-Type": "text/html"}, "<html>small</html>"),
+            "/video": (200, {"Content-Type": "video/mp4"}, b"\0" * 100000),
+        }
+    )
+    client = http.Http()
+
+    page = client.get(f"{base_url}page", ("text/html",))
+    video = client.get(f"{base_url}video", ("text/html",))
+
+    assert page.data == b"<html>small</html>"
+    assert video.skipped
+    assert video.data == b""
+
+    transfer = client.stats()["transfer"]
+    assert transfer["bytes_downloaded"] == len(page.data)
+    assert transfer["bytes_skipped"] == 100000
+    assert transfer["skipped_responses"] == 1
+
+
+def test_get_caps_body_size(serve):
+    base_url = serve({"/": (200, {"Content-Type": "text/html"}, "x" * 5000)})
+    client = http.Http(max_size=1000, chunk_size=256)
+
+    response = client.get(base_url)
+
+    assert response.truncated
+    assert response.data == b"x" * 1000
+    # whatever was not read off the connection
+    assert client.stats()["transfer"]["bytes_skipped"] == 5000 - response.wire_bytes
+
+
+def test_compressed_bodies_are_capped_on_their_decoded_size(serve):
+    def compressed(body):
+        return (
+            200,
+            {"Content-Type": "text/html", "Content-Encoding": "gzip"},
+            gzip.compress(body.encode()),
+        )
+
+    base_url = serve({"/fits": compressed("x" * 1000), "/big": compressed("x" * 50000)})
+    client = http.Http(max_size=1000, chunk_size=256)
+
+    fits = client.get(f"{base_url}fits")
+    big = client.get(f"{base_url}big")
+
+    assert not fits.truncated
+    assert fits.data == b"x" * 1000
+    assert big.truncated
+    assert big.data == b"x" * 1000
+
+    transfer = client.stats()["transfer"]
+    assert transfer["truncated_responses"] == 1
+    assert (
+        transfer["bytes_skipped"] == len(gzip.compress(b"x" * 50000)) - big.wire_bytes
+    )
+
+
+def test_streamed_bodies_are_capped(serve):
+    base_url = serve({"/": (200, {"Content-Type": "text/html"}, "x" * 5000)})
+    client = http.Http(max_stream_size=3000, chunk_size=256)
+
+    response = client.get(base_url, stream_above=1000)
+
+    assert response.data is None
+    assert b"".join(response.chunks) == b"x" * 3000
+    assert response.truncated
+
+    transfer = client.stats()["transfer"]
+    assert transfer["bytes_downloaded"] == 3000
+    assert transfer["truncated_responses"] == 1
+    assert transfer["bytes_skipped"] == 5000 - response.wire_bytes
+
+
+def test_get_negotiates_compression(serve):
+    body = "<html><body>" + "compressible text " * 500 + "</body></html>"
+
+    def page(handler):
+        if "gzip" not in handler.headers.get("Accept-Encoding", ""):
+            return 200, {"Content-Type": "text/html"}, body
+        return (
+            200,
+            {"Content-Type": "text/html", "Content-Encoding": "gzip"},
+            gzip.compress(body.encode()),
+        )
+
+    base_url = serve({"/": page})
+    client = http.Http()
+
+    response = client.get(base_url)
+
+    assert response.data == body.encode()
+    assert response.wire_bytes < len(body) / 5
+
+    transfer = client.stats()["transfer"]
+    assert transfer["wire_bytes"] == response.wire_bytes
+    assert transfer["bytes_downloaded"] == len(body)
+
+
+def test_connection_stats(serve):
+    base_url = serve({"/": "<html>reused</html>"})
+    client = http.Http(pool_size=2, retries=1, backoff_factor=0.1)
+
+    for _ in range(3):
+        client.get(base_url)
+
+    connections = client.stats()["connections"]
+    assert connections["requests"] == 3
+    assert connections["new_connections"] == 1
+    assert connections["reused_connections"] == 2
+    assert connections["pool_full_waits"] == 0
@@ -0,0 +1,44 @@
+import pytest
+
+from pyseoanalyzer import analyze
+
+from .conftest import html_page
+
+pytest.importorskip("numpy")
+
+
+def topic_site():
+    """
+    Pages sharing a long navigation text, each about its own topic
+    """
+
+    navigation = "home products pricing contact " * 20
+    topics = ["gardening", "astronomy", "woodworking", "photography"]
+    pages = {}
+
+    for i, topic in enumerate(topics):
+        path = "/" if i == 0 else f"/{topic}"
+        body = f"{navigation} {topic} tips and {topic} guides " * 2
+        pages[path] = html_page(
+            f"All about {topic}", body, links=[f"/{t}" for t in topics[1:]]
+        )
+
+    return pages
+
+
+@pytest.mark.parametrize("scoring", ["bm25", "tfidf"])
+def test_keyword_scores_rank_page_topics_first(serve, scoring):
+    base_url = serve(topic_site())
+
+    output = analyze(base_url, keyword_scoring=scoring, top_keywords=3)
+
+    # by count the navigation wins
+    assert output["keywords"][0]["word"] in ("home", "product", "price", "contact")
+
+    site_words = [keyword["word"] for keyword in output["keyword_scores"]]
+    assert len(site_words) == 3
+    assert "home" not in site_words
+
+    for page in output["pages"]:
+        topic = page["title"].split()[-1]
+        assert page["keyword_scores"][0]["word"].startswith(topic[:5])
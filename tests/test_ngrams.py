@@ -0,0 +1,109 @@
+import random
+import time
+import tracemalloc
+
+import pytest
+
+from pyseoanalyzer import analyze
+from pyseoanalyzer.page import Page
+from pyseoanalyzer.website import Website
+
+from .conftest import small_site
+
+np = pytest.importorskip("numpy")
+
+from pyseoanalyzer import ngrams  # noqa: E402
+
+
+def random_text(rng, words, vocabulary):
+    return [
+        " ".join(rng.choice(vocabulary) for _ in range(10)) for _ in range(words // 10)
+    ]
+
+
+def processed(text, text_engine):
+    page = Page(text_engine=text_engine)
+    page.process_text(text)
+    return page
+
+
+def test_numpy_engine_matches_python():
+    rng = random.Random(7)
+    vocabulary = [f"w{i}" for i in range(50)] + ["the", "running", "ünïcode"]
+
+    for words in (0, 10, 20, 500):
+        text = random_text(rng, words, vocabulary)
+        python = processed(text, "python")
+        vectorized = processed(text, "numpy")
+
+        for n in ("bigrams", "trigrams"):
+            expected = getattr(python, n)
+            counted = ngrams.materialize(getattr(vectorized, n))
+            assert list(counted.items()) == list(expected.items())
+
+
+def test_unpackable_rows_are_sorted():
+    big = np.array([2**31, 5, 2**31, 5, 7], dtype=np.uint32)
+    columns = [big, big[::-1].copy(), big]
+
+    first, counts = ngrams.first_occurrences(columns)
+    # rows 1 and 3 are both (5, 5, 5)
+    assert first.tolist() == [0, 1, 2, 4]
+    assert counts.tolist() == [1, 2, 1, 1]
+
+    first, counts = ngrams.first_occurrences(columns, np.array([1, 2, 3, 4, 5]))
+    assert counts.tolist() == [1, 6, 3, 5]
+
+
+def test_site_tables_match_python(serve):
+    base_url = serve(small_site())
+
+    def keywords(text_engine):
+        output = analyze(base_url, text_engine=text_engine)
+        return output["keywords"], [p["trigrams"] for p in output["pages"]]
+
+    assert keywords("numpy") == keywords("python")
+
+
+def test_benchmark_large_pages():
+    """
+    Counts the n-grams of 10 pages of 20k words with both engines and
+    merges them site-wide. The numpy engine keeps ids instead of strings, so
+    its site-wide tables need a fraction of the memory, and it counts
+    without building a string per n-gram, so it is not slower either.
+    """
+
+    rng = random.Random(1)
+    vocabulary = [f"word{i}" for i in range(3000)]
+    pages = [random_text(rng, 20000, vocabulary) for _ in range(10)]
+    results = {}
+
+    for text_engine in ("python", "numpy"):
+        # timed without tracing, tracemalloc slows allocations down
+        started = time.process_time()
+        analyze_pages(pages, text_engine)
+        elapsed = time.process_time() - started
+
+        tracemalloc.start()
+        site = analyze_pages(pages, text_engine)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[text_engine] = (elapsed, memory, site)
+
+    python, vectorized = results["python"], results["numpy"]
+
+    assert vectorized[2][1].above(4) == {k: v for k, v in python[2][1].items() if v > 4}
+    assert vectorized[1] < python[1] / 2
+    assert vectorized[0] < python[0]
+
+
+def analyze_pages(pages, text_engine):
+    site = Website(
+        "https://www.example.com/", None, False, False, True, text_engine=text_engine
+    )
+
+    for text in pages:
+        page = processed(text, text_engine)
+        site.merge(page)
+
+    return site.bigrams, site.trigrams
@@ -1,4 +1,8 @@
+import pytest
+import time
+
 from pyseoanalyzer import page
+from pyseoanalyzer import rules
 
 
 def test_page_init():
@@ -25,3 +29,182 @@ def test_analyze():
         url="https://www.sethserver.com/", base_domain="https://www.sethserver.com/"
     )
     assert p.analyze()
+
+
+def test_analyze_single_parse():
+    html = (
+        "<html><head><TITLE>Mixed CASE Title Long Enough</TITLE>"
+        '<meta name="Keywords" content="SEO, Crawl" class=" a  b ">'
+        '<meta property="og:title" content="x">'
+        "</head><body><h1>Head<!-- c -->line</h1>"
+        "<p>visible text<script>hidden words</script> tail text</p>"
+        '<img src="A.PNG" title=\'it"s\'><img alt="ok" src="b.png">'
+        '<a href="/Rel">Click Here</a><a href="#top" title="t">top</a>'
+        "</body></html>"
+    )
+    p = page.Page(
+        url="https://www.example.com/",
+        base_domain="https://www.example.com/",
+        analyze_headings=True,
+    )
+    p.analyze(html)
+
+    assert p.title == "mixed case title long enough"
+    assert p.headings == {"h1": ["Headline"]}
+    assert "hidden" not in p.wordcount
+    assert p.bigrams["headline visible"] == 1
+    assert p.links == ["https://www.example.com/Rel", "https://www.example.com/"]
+    assert (
+        "Keywords should be avoided as they are a spam indicator and no longer "
+        'used by Search Engines: [<meta class="a b" content="seo, crawl" name="keywords"/>]'
+    ) in p.warnings
+    assert 'Image missing alt tag: <img src="a.png" title=\'it"s\'/>' in p.warnings
+    assert "Anchor missing title tag: /Rel" in p.warnings
+    assert "Anchor text contains generic text: click here" in p.warnings
+    assert "Missing og:description" in p.warnings
+    assert "Missing og:title" not in p.warnings
+
+
+def test_streaming_analyzer_matches_tree():
+    html = (
+        "<html><head><title>A streamed page title</title>"
+        '<meta name="description" content="Streamed description">'
+        '<meta name="keywords" content="a, b"><meta property="og:image" content="i">'
+        '<link rel="canonical" href="https://www.example.com/c"></head><body>'
+        + "".join(
+            f'<h2>Part {i}</h2><p>para<!-- x -->graph {i} <a href="/p{i}">more</a>'
+            f'<img src="i{i}.png"></p><script>skip {i}</script>'
+            for i in range(200)
+        )
+        + "</body></html>"
+    )
+
+    def analyzed(stream_threshold):
+        p = page.Page(
+            url="https://www.example.com/",
+            base_domain="https://www.example.com/",
+            analyze_headings=True,
+            analyze_extra_tags=True,
+            stream_threshold=stream_threshold,
+        )
+        p.analyze(html)
+        return p
+
+    tree = analyzed(None)
+    streamed = analyzed(1024)
+
+    assert not tree.streamed
+    assert streamed.streamed
+    assert streamed.talk() == tree.talk()
+    assert streamed.links == tree.links
+    assert streamed.wordcount == tree.wordcount
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "<html><body><p>inside the page</p></body></html>"
+        '<p>after the page</p> trailing words <a href="/late">late link</a>',
+        "<html><body>first document</body></html><html><body>second</body></html>",
+        "<html><body>inside</body></html><!-- note --> after a comment",
+        "<p>no html element</p></html><div><span>dropped</span> text</div>",
+    ],
+)
+def test_malformed_pages_stream_like_the_tree(html):
+    def analyzed(stream_threshold):
+        p = page.Page(
+            url="https://www.example.com/",
+            base_domain="https://www.example.com/",
+            stream_threshold=stream_threshold,
+        )
+        p.analyze(html)
+        return p
+
+    tree = analyzed(None)
+    streamed = analyzed(0)
+
+    assert streamed.streamed
+    assert streamed.total_word_count == tree.total_word_count
+    assert streamed.wordcount == tree.wordcount
+    assert streamed.links == tree.links
+
+
+@pytest.mark.parametrize("text_engine", ["python", "numpy"])
+def test_text_is_counted_in_batches(monkeypatch, text_engine):
+    if text_engine == "numpy":
+        pytest.importorskip("numpy")
+
+    text = [f"word{i % 7} and word{i % 5}" for i in range(300)]
+
+    def counted():
+        p = page.Page(text_engine=text_engine, near_duplicates=True)
+        p.process_text(text)
+        return p.talk(), p.wordcount, p.fingerprint
+
+    whole = counted()
+    monkeypatch.setattr(page, "TEXT_BATCH", 2)
+
+    assert counted() == whole
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(rules, "RULES", dict(rules.RULES))
+    yield rules
+    rules.compile_rules.cache_clear()
+
+
+def test_rules_can_be_added_and_disabled(registry):
+    @registry.register("lists", ("ul", "ol"))
+    def check_lists(p, lists):
+        p.warn(f"{len(lists)} lists")
+
+    html = (
+        "<html><head><title>Rules page title</title></head>"
+        "<body><ul><li>a</li></ul><ol><li>b</li></ol><img src='x.png'></body></html>"
+    )
+
+    p = page.Page(url="https://www.example.com/", disabled_rules=["images", "og"])
+    p.analyze(html)
+
+    assert p.warnings[-1] == "2 lists"
+    assert not any(w.startswith(("Image", "Missing og")) for w in p.warnings)
+    assert set(p.rule_times) == set(p.rule_engine().names)
+    assert "images" not in p.rule_times
+
+    p = page.Page(url="https://www.example.com/", rules=["lists"])
+    p.analyze(html)
+
+    assert p.warnings == ["2 lists"]
+    assert p.title == ""
+
+
+def test_unknown_rule():
+    with pytest.raises(ValueError):
+        page.Page(disabled_rules=["no-such-rule"]).rule_engine()
+
+
+def test_process_text_scales_linearly():
+    vocabulary = [f"word{i}" for i in range(500)] + ["the", "and", "running"]
+
+    def best_time(words):
+        text = [
+            " ".join(vocabulary[(i * 7919) % len(vocabulary)] for i in range(j, j + 10))
+            for j in range(0, words, 10)
+        ]
+        timings = []
+
+        for _ in range(3):
+            p = page.Page()
+            started = time.perf_counter()
+            p.process_text(text)
+            timings.append(time.perf_counter() - started)
+
+        assert p.total_word_count == words
+        return min(timings)
+
+    small = best_time(10000)
+    large = best_time(80000)
+
+    # 8 times the words, quadratic counting took ~64 times as long
+    assert large < small * 20
@@ -0,0 +1,173 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from pyseoanalyzer.http import Http
+from pyseoanalyzer.resolver import Resolver
+
+
+def test_caches_positive_and_negative_lookups():
+    resolver = Resolver()
+
+    assert resolver.addresses("localhost")
+    assert resolver.addresses("localhost")
+    assert resolver.addresses("127.0.0.1") == ["127.0.0.1"]
+
+    for _ in range(2):
+        with pytest.raises(socket.gaierror):
+            resolver.resolve("does-not-exist.invalid")
+
+    stats = resolver.stats()
+    assert stats["misses"] == 2
+    assert stats["hits"] == 1
+    assert stats["negative_hits"] == 1
+    assert stats["lookups"] == 2
+
+
+def test_http_pool_uses_resolver(serve):
+    base_url = serve({"/": "<html></html>"})
+    resolver = Resolver()
+    client = Http(resolver=resolver)
+
+    for path in ["", "a", "b"]:
+        client.get(base_url.replace("127.0.0.1", "localhost") + path)
+
+    assert resolver.stats()["lookups"] == 1
+    assert client.stats()["dns"]["cached_hosts"] == 1
+
+
+def test_connects_to_the_next_address_when_one_fails(serve):
+    base_url = serve({"/": "<html></html>"})
+
+    class DualStackResolver(Resolver):
+        def lookup(self, host):
+            # nothing listens on 127.0.0.2, like a broken IPv6 address
+            addresses = [
+                (socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 0))
+                for address in ("127.0.0.2", "127.0.0.1")
+            ]
+            self.entries[host] = (float("inf"), addresses, None)
+
+            return self.entries[host]
+
+    resolver = DualStackResolver()
+    client = Http(resolver=resolver)
+
+    assert resolver.addresses("example.test") == ["127.0.0.2", "127.0.0.1"]
+    assert client.get(base_url.replace("127.0.0.1", "example.test")).status == 200
+
+
+class RecordResolver(Resolver):
+    """
+    Answers from fixed records instead of asking DNS
+    """
+
+    def __init__(self, records, **kwargs):
+        super().__init__(**kwargs)
+        self.dns = "records"
+        self.records = records
+        self.queries = 0
+
+    def query_dns(self, host):
+        self.queries += 1
+        address, ttl = self.records[host]
+
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, 0))], ttl
+
+
+def test_dns_answers_are_cached_for_their_ttl():
+    resolver = RecordResolver(
+        {
+            "short.example.com": ("127.0.0.1", 0.2),
+            "long.example.com": ("127.0.0.1", 1e6),
+        },
+        min_ttl=0.1,
+        max_ttl=60.0,
+    )
+
+    for _ in range(2):
+        assert resolver.addresses("short.example.com") == ["127.0.0.1"]
+        assert resolver.addresses("long.example.com") == ["127.0.0.1"]
+
+    assert resolver.queries == 2
+    assert resolver.entries["long.example.com"][0] - time.monotonic() <= 60.0
+
+    time.sleep(0.25)
+    resolver.addresses("short.example.com")
+    resolver.addresses("long.example.com")
+
+    assert resolver.queries == 3
+
+
+def test_local_names_skip_dns(tmp_path):
+    hosts = tmp_path / "hosts"
+    hosts.write_text("# comment\n10.0.0.1 intranet.example.com Alias.Example.com\n")
+    resolver = Resolver(hosts_file=str(hosts))
+
+    for host in [
+        "intranet.example.com",
+        "alias.example.com.",
+        "localhost",
+        "printer.local",
+        "10.0.0.1",
+        "[::1]",
+    ]:
+        assert resolver.system_only(host)
+
+    assert not resolver.system_only("www.example.com")
+
+
+@pytest.fixture
+def nameserver():
+    """
+    Serves A records for www.example.test on a local UDP port, with a TTL of
+    42 seconds, and NXDOMAIN for every other name
+    """
+
+    message = pytest.importorskip("dns.message")
+    rcode = pytest.importorskip("dns.rcode")
+    rdatatype = pytest.importorskip("dns.rdatatype")
+    rrset = pytest.importorskip("dns.rrset")
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", 0))
+
+    def serve():
+        while True:
+            try:
+                data, client = sock.recvfrom(512)
+            except OSError:
+                return
+
+            query = message.from_wire(data)
+            response = message.make_response(query)
+            question = query.question[0]
+
+            if question.name.to_text() != "www.example.test.":
+                response.set_rcode(rcode.NXDOMAIN)
+            elif question.rdtype == rdatatype.A:
+                response.answer.append(
+                    rrset.from_text(question.name, 42, "IN", "A", "127.0.0.1")
+                )
+
+            sock.sendto(response.to_wire(), client)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield sock.getsockname()
+    sock.close()
+
+
+def test_dns_lookups_use_the_record_ttl(nameserver):
+    resolver = Resolver(min_ttl=5.0, max_ttl=3600.0)
+    resolver.dns.nameservers = [nameserver[0]]
+    resolver.dns.port = nameserver[1]
+
+    addresses, ttl = resolver.query("www.example.test")
+
+    assert [info[4][0] for info in addresses] == ["127.0.0.1"]
+    assert 40 < ttl <= 42
+
+    with pytest.raises(socket.gaierror):
+        resolver.query("missing.example.test")
@@ -0,0 +1,82 @@
+from pyseoanalyzer.http import USER_AGENT
+from pyseoanalyzer.robots import parse_robots
+from pyseoanalyzer.website import Website
+
+from .conftest import small_site
+
+ROBOTS = """
+User-agent: other-bot
+Disallow: /
+
+User-agent: *
+Disallow: /beta
+Disallow: /*.pdf$
+Allow: /beta/open
+Crawl-delay: 0.01
+"""
+
+
+def test_parse_robots():
+    rules = parse_robots(ROBOTS)
+
+    assert rules.crawl_delay == 0.01
+    assert rules.allowed("/alpha")
+    assert not rules.allowed("/beta")
+    assert not rules.allowed("/beta/closed")
+    assert rules.allowed("/beta/open/page")
+    assert not rules.allowed("/files/report.pdf")
+    assert rules.allowed("/files/report.pdf?download=1")
+    assert not parse_robots(ROBOTS, "other-bot/1.0").allowed("/alpha")
+    assert parse_robots("").allowed("/anything")
+
+
+def test_crawl_skips_disallowed_urls(serve):
+    pages = small_site()
+    pages["/robots.txt"] = (200, {"Content-Type": "text/plain"}, ROBOTS)
+    base_url = serve(pages)
+
+    site = Website(base_url, None, False, False, True)
+    site.crawl()
+
+    assert len(site.crawled_pages) == 4
+    assert base_url + "beta" not in site.crawled_urls
+    assert "/beta" not in serve.requests
+    assert serve.requests.count("/robots.txt") == 1
+
+    stats = site.stats()
+    assert stats["robots"]["skipped_urls"] == 1
+    assert (
+        stats["hosts"]["127.0.0.1:" + base_url.split(":")[-1].strip("/")]["min_delay"]
+        == 0.01
+    )
+
+    ignored = Website(base_url, None, False, False, True, respect_robots=False)
+    ignored.crawl()
+
+    assert len(ignored.crawled_pages) == 5
+
+
+def test_robots_are_matched_against_the_user_agent_sent(serve):
+    pages = small_site()
+    agents = []
+
+    def robots(handler):
+        agents.append(handler.headers["User-Agent"])
+        return (
+            200,
+            {"Content-Type": "text/plain"},
+            (
+                "User-agent: python-seo-analyzer\nDisallow: /alpha\n\n"
+                "User-agent: *\nDisallow: /beta\n"
+            ),
+        )
+
+    pages["/robots.txt"] = robots
+    base_url = serve(pages)
+
+    site = Website(base_url, None, False, False, True)
+    site.crawl()
+
+    assert agents == [USER_AGENT]
+    assert base_url + "alpha" not in site.crawled_urls
+    assert base_url + "beta" in site.crawled_urls
@@ -0,0 +1,53 @@
+import time
+
+from pyseoanalyzer.http import Http
+from pyseoanalyzer.scheduler import HostScheduler
+from pyseoanalyzer.scheduler import parse_retry_after
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_window_grows_and_backs_off(serve):
+    throttle = {"on": False}
+
+    def page(handler):
+        if throttle["on"]:
+            return 429, {"Retry-After": "0.2"}, ""
+        return 200, {}, "<html></html>"
+
+    base_url = serve({"/": page})
+    scheduler = HostScheduler(Http(), max_in_flight=4)
+    host = base_url.split("/")[2]
+
+    for _ in range(10):
+        scheduler.get(base_url)
+
+    assert scheduler.state()[host]["window"] == 4
+
+    throttle["on"] = True
+    scheduler.get(base_url)
+    throttle["on"] = False
+
+    state = scheduler.state()[host]
+    assert state["window"] == 2
+    assert state["throttle_events"] == 1
+
+    start = time.monotonic()
+    scheduler.get(base_url)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_min_delay(serve):
+    base_url = serve({"/": "<html></html>"})
+    scheduler = HostScheduler(Http(), min_delay=0.1)
+
+    start = time.monotonic()
+    for _ in range(3):
+        scheduler.get(base_url)
+
+    assert time.monotonic() - start >= 0.2
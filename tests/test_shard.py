@@ -0,0 +1,106 @@
+import pytest
+
+from urllib.parse import urlsplit
+
+from pyseoanalyzer import analyze
+from pyseoanalyzer.http import Http
+from pyseoanalyzer.shard import ShardCoordinator
+from pyseoanalyzer.shard import build_client
+from pyseoanalyzer.shard import client_config
+from pyseoanalyzer.shard import shard_of
+from pyseoanalyzer.stemmer import stem_stats
+from pyseoanalyzer.website import Website
+
+from .conftest import html_page
+from .conftest import small_site
+
+
+def test_shard_of_is_stable_and_spreads_a_host():
+    assert shard_of("https://example.com/", 4) == shard_of("https://example.com/", 4)
+    assert {shard_of(f"https://example.com/{i}", 4) for i in range(50)} == {
+        0,
+        1,
+        2,
+        3,
+    }
+
+
+def test_workers_build_the_same_client():
+    client = Http(pool_size=3, read_timeout=5.0, retries=0)
+
+    assert build_client(client_config(client)).options == client.options
+    assert client_config(object()) is None
+
+
+def test_sharded_crawl_matches_single_process(serve):
+    base_url = serve(small_site())
+
+    single = Website(base_url, None, False, False, True)
+    single.crawl()
+    sharded = Website(base_url, None, False, False, True, shards=2)
+    sharded.crawl()
+
+    assert sharded.crawled_urls == single.crawled_urls
+    assert sharded.wordcount == single.wordcount
+    assert sharded.bigrams == single.bigrams
+    assert sharded.trigrams == single.trigrams
+    assert sharded.content_hashes == single.content_hashes
+    assert sum(sharded.stats()["sharding"]["pages_per_shard"]) == 5
+
+    # every request still went through the coordinator's scheduler
+    host = urlsplit(base_url).netloc
+    assert sharded.stats()["hosts"][host]["requests"] == (
+        single.stats()["hosts"][host]["requests"]
+    )
+    assert sharded.stats()["hosts"][host]["in_flight"] == 0
+
+    # words are stemmed in the workers, and counted there
+    worker_calls = sum(s["calls"] for s in sharded.worker_stemming.values())
+    assert worker_calls > 0
+    assert sharded.stats()["stemming"]["calls"] == stem_stats()["calls"] + worker_calls
+
+
+def test_a_single_host_is_spread_over_the_shards(serve):
+    paths = ["/"] + [f"/{i}" for i in range(29)]
+    base_url = serve({path: html_page(path, "spread", paths) for path in paths})
+
+    site = Website(base_url, None, False, False, True, shards=2)
+    site.crawl()
+
+    pages_per_shard = site.stats()["sharding"]["pages_per_shard"]
+    assert pages_per_shard == [
+        sum(1 for path in paths if shard_of(base_url + path[1:], 2) == shard)
+        for shard in range(2)
+    ]
+    assert all(pages_per_shard)
+
+
+def test_worker_errors_are_reported(serve):
+    pages = small_site()
+    pages["/"] = pages["/"].replace("</body>", '<a href="/broken">x</a></body>')
+    pages["/broken"] = b"<html><body>\xff\xfe</body></html>"
+    base_url = serve(pages)
+
+    output = analyze(base_url, shards=2)
+
+    assert len(output["pages"]) == 5
+    assert len(output["errors"]) == 1
+    assert output["errors"][0].startswith(f"{base_url}broken: ")
+
+
+def test_coordinator_stops_when_a_busy_worker_dies(serve):
+    class Worker:
+        def __init__(self, alive):
+            self.alive = alive
+
+        def is_alive(self):
+            return self.alive
+
+    site = Website(serve(small_site()), None, False, False, True, shards=2)
+    coordinator = ShardCoordinator(site, 2)
+    workers = [Worker(True), Worker(False)]
+
+    coordinator.check_workers(workers, [3, 0])
+
+    with pytest.raises(RuntimeError):
+        coordinator.check_workers(workers, [3, 1])
@@ -0,0 +1,96 @@
+import gzip
+
+from pyseoanalyzer import analyze
+from pyseoanalyzer.sitemap import SitemapReader
+from pyseoanalyzer.website import Website
+
+from .conftest import small_site
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def urlset(base_url, paths):
+    entries = "".join(
+        f"<url><loc>{base_url}{path}</loc><lastmod>2024-01-0{i + 1}</lastmod></url>"
+        for i, path in enumerate(paths)
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset {NS}>{entries}</urlset>'
+
+
+def test_reads_nested_gzipped_indexes(serve):
+    pages = {}
+    base_url = serve(pages)
+
+    pages["/index.xml"] = (
+        f"<sitemapindex {NS}>"
+        f"<sitemap><loc>{base_url}nested</loc></sitemap>"
+        f"<sitemap><loc>{base_url}plain.txt</loc></sitemap>"
+        "</sitemapindex>"
+    )
+    pages["/nested"] = (
+        200,
+        {"Content-Type": "application/gzip"},
+        gzip.compress(
+            f"<sitemapindex {NS}><sitemap><loc>{base_url}pages.xml.gz</loc></sitemap></sitemapindex>".encode()
+        ),
+    )
+    pages["/pages.xml.gz"] = (
+        200,
+        {"Content-Type": "application/octet-stream"},
+        gzip.compress(urlset(base_url, ["alpha", "beta"]).encode()),
+    )
+    pages["/plain.txt"] = (200, {}, f"\n{base_url}gamma\n{base_url}delta")
+
+    reader = SitemapReader(max_workers=2, queue_size=1)
+    entries = sorted(reader.read(f"{base_url}index.xml"))
+
+    assert reader.errors == []
+    assert entries == [
+        (f"{base_url}alpha", "2024-01-01"),
+        (f"{base_url}beta", "2024-01-02"),
+        (f"{base_url}delta", None),
+        (f"{base_url}gamma", None),
+    ]
+
+
+def test_website_seeds_from_sitemap(serve):
+    pages = small_site()
+    base_url = serve(pages)
+    pages["/sitemap"] = urlset(base_url, ["gamma", "alpha"])
+
+    site = Website(base_url, f"{base_url}sitemap", False, False, False)
+    site.crawl()
+
+    assert [page.url for page in site.crawled_pages] == [f"{base_url}gamma"]
+
+
+def test_broken_child_sitemaps_are_reported(serve):
+    pages = small_site()
+    base_url = serve(pages)
+    pages["/sitemap"] = (
+        f"<sitemapindex {NS}>"
+        f"<sitemap><loc>{base_url}pages.xml</loc></sitemap>"
+        f"<sitemap><loc>{base_url}missing.xml</loc></sitemap>"
+        "</sitemapindex>"
+    )
+    pages["/pages.xml"] = urlset(base_url, ["alpha"])
+
+    output = analyze(base_url, f"{base_url}sitemap", follow_links=False)
+
+    assert [page["url"] for page in output["pages"]] == [f"{base_url}alpha"]
+    assert len(output["errors"]) == 1
+    assert output["errors"][0].startswith(f"{base_url}missing.xml: ")
+
+
+def test_unreadable_sitemaps_are_reported(serve):
+    pages = small_site()
+    base_url = serve(pages)
+    pages["/broken.xml"] = f"<urlset {NS}><url><loc>{base_url}alpha</loc></url><url>"
+
+    # the base url is still crawled, and urls read before an error are kept
+    for sitemap, crawled in [("missing.xml", ""), ("broken.xml", "alpha")]:
+        output = analyze(base_url, f"{base_url}{sitemap}", follow_links=False)
+
+        assert [page["url"] for page in output["pages"]] == [base_url + crawled]
+        assert len(output["errors"]) == 1
+        assert output["errors"][0].startswith(f"{base_url}{sitemap}: ")
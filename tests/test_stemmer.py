@@ -0,0 +1,30 @@
+from pyseoanalyzer import stemmer
+
+WORDS = ["running", "runs", "fundamentally", "happiness", "relational", "cats", "a"]
+
+
+def test_stem_many_matches_porter_stem():
+    assert stemmer.stem_many(WORDS * 3) == [stemmer.porter_stem(w) for w in WORDS] * 3
+
+
+def test_stem_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(stemmer, "_table", {})
+    monkeypatch.setattr(stemmer, "_table_hits", 0)
+    stemmer.stem.cache_clear()
+    path = str(tmp_path / "stems.pickle")
+
+    assert stemmer.build_stem_table(WORDS + WORDS, path) == len(WORDS)
+    assert stemmer.load_stem_table(path) == len(WORDS)
+
+    stems = stemmer.stem_many(WORDS + WORDS + ["unlisted"])
+
+    assert stems[: len(WORDS)] == [stemmer.porter_stem(w) for w in WORDS]
+
+    stats = stemmer.stem_stats()
+    assert stats["calls"] == 2 * len(WORDS) + 1
+    assert stats["cache_hits"] == len(WORDS)
+    assert stats["table_hits"] == len(WORDS)
+    assert stats["hit_rate"] == 2 * len(WORDS) / stats["calls"]
+    assert stats["table_words"] == len(WORDS)
+
+    stemmer.stem.cache_clear()
@@ -0,0 +1,62 @@
+import random
+
+from collections import Counter
+
+from pyseoanalyzer import analyze
+from pyseoanalyzer.topk import SpaceSaving
+
+from .conftest import small_site
+
+
+def zipf_stream(size, keys=5000, seed=3):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, keys + 1)]
+    return rng.choices([f"key{i}" for i in range(keys)], weights, k=size)
+
+
+def test_space_saving_bounds():
+    stream = zipf_stream(50000)
+    exact = Counter(stream)
+
+    for sketch_width in (0, 2000):
+        counts = SpaceSaving(200, sketch_width)
+
+        for key in stream:
+            counts.add(key)
+
+        bound = counts.stats()["error_bound"]
+        assert bound == len(stream) / 200
+
+        for key, count in exact.items():
+            if count > bound:
+                assert key in counts
+
+        for key, count in counts.items():
+            assert 0 <= count - exact[key] <= counts.errors[key] <= bound
+
+        top = exact.most_common(20)
+        assert [(key, counts[key]) for key, _ in top] == top
+
+
+def test_sketch_tightens_errors():
+    stream = zipf_stream(50000)
+
+    plain = SpaceSaving(200)
+    sketched = SpaceSaving(200, 2000)
+
+    for key in stream:
+        plain.add(key)
+        sketched.add(key)
+
+    assert sum(sketched.errors.values()) < sum(plain.errors.values())
+
+
+def test_keyword_counters_match_exact(serve):
+    base_url = serve(small_site())
+
+    exact = analyze(base_url)
+    approximate = analyze(base_url, keyword_counters=8, keyword_sketch=True)
+
+    counters = approximate["crawl_stats"]["keyword_counters"]
+    assert counters["trigrams"]["replaced"] > 0
+    assert approximate["keywords"][:5] == exact["keywords"][:5]
@@ -0,0 +1,153 @@
+from collections import Counter
+
+from pyseoanalyzer.stemmer import stem_stats
+from pyseoanalyzer.website import Website
+
+from .conftest import html_page
+from .conftest import small_site
+
+
+def crawl(base_url, **kwargs):
+    site = Website(base_url, None, False, False, True, **kwargs)
+    site.crawl()
+    return site
+
+
+def test_concurrent_crawl_matches_sequential(serve):
+    base_url = serve(small_site())
+
+    sequential = crawl(base_url)
+    concurrent = crawl(base_url, concurrency=4, concurrency_per_host=2)
+
+    assert len(sequential.crawled_pages) == 5
+    assert sequential.crawled_urls == concurrent.crawled_urls
+    assert sequential.wordcount == concurrent.wordcount
+    assert sequential.bigrams == concurrent.bigrams
+    assert sequential.trigrams == concurrent.trigrams
+    assert sequential.content_hashes == concurrent.content_hashes
+
+
+def test_process_pool_pipeline_matches_sequential(serve):
+    base_url = serve(small_site())
+
+    sequential = crawl(base_url)
+    pipelined = crawl(base_url, concurrency=2, analyze_workers=2, queue_size=1)
+
+    assert sequential.crawled_urls == pipelined.crawled_urls
+    assert sequential.wordcount == pipelined.wordcount
+    assert sequential.bigrams == pipelined.bigrams
+    assert sequential.trigrams == pipelined.trigrams
+    assert sequential.content_hashes == pipelined.content_hashes
+
+    rule_times = pipelined.stats()["rule_cpu_time"]
+    assert list(rule_times) == list(pipelined.rule_names)
+    assert sum(rule_times.values()) > 0
+
+    worker_calls = sum(s["calls"] for s in pipelined.worker_stemming.values())
+    assert worker_calls > 0
+    assert (
+        pipelined.stats()["stemming"]["calls"] == stem_stats()["calls"] + worker_calls
+    )
+
+
+def test_result_store_reuses_unchanged_pages(serve, tmp_path):
+    pages = small_site()
+    base_url = serve(pages)
+    store = str(tmp_path / "results.sqlite")
+
+    first = crawl(base_url, result_store=store)
+    pages["/alpha"] = pages["/alpha"].replace("crawler", "indexer")
+    second = crawl(base_url, result_store=store)
+
+    assert first.stats()["reused_pages"] == 0
+    assert second.stats()["reused_pages"] == 4
+    assert second.wordcount == crawl(base_url).wordcount
+
+
+def deep_site():
+    """
+    A chain of pages, each linking to the next one
+    """
+
+    return {
+        "/" if i == 0 else f"/{i}": html_page(f"Chain page {i}", "deep", [f"/{i + 1}"])
+        for i in range(6)
+    }
+
+
+def test_max_depth(serve):
+    site = crawl(serve(deep_site()), max_depth=2)
+
+    assert sorted(page.depth for page in site.crawled_pages) == [0, 1, 2]
+    assert site.stats()["stop_reason"] is None
+
+
+def test_max_pages_reports_unvisited_frontier(serve):
+    site = crawl(serve(small_site()), max_pages=2, concurrency=3)
+
+    assert len(site.crawled_pages) == 2
+    assert site.stats()["stop_reason"] == "max_pages"
+    assert site.stats()["frontier_size"] == 3
+
+
+def test_deadline(serve):
+    site = crawl(serve(small_site()), deadline=0)
+
+    assert site.crawled_pages == []
+    assert site.stats()["stop_reason"] == "deadline"
+
+
+def test_redirect_sources_are_short_circuited(serve):
+    pages = {
+        "/": html_page("Home", "home page text", links=["/old"]),
+        "/old": (301, {"Location": "/mid"}, ""),
+        "/mid": (301, {"Location": "/new"}, ""),
+        "/new": html_page("New", "new page text", links=["/", "/mid", "/new"]),
+    }
+    base_url = serve(pages)
+
+    site = crawl(base_url)
+
+    assert serve.requests.count("/mid") == 1
+    assert serve.requests.count("/new") == 1
+    assert len(site.crawled_pages) == 2
+
+    old = site.crawled_pages[1].talk()
+    assert old["url"] == base_url + "old"
+    assert old["redirect_hops"] == 2
+    assert old["redirects"][-1]["location"] == base_url + "new"
+    assert site.stats()["redirects"] == {"sources": 2, "short_circuited": 1}
+
+
+def test_pages_reached_through_several_redirects_are_counted_once(serve):
+    pages = {
+        "/": html_page("Home", "home page text", links=["/old", "/older", "/alpha"]),
+        "/old": (301, {"Location": "/alpha"}, ""),
+        "/older": (302, {"Location": "/alpha"}, ""),
+        "/alpha": html_page("Alpha", "alpha page text", links=["/", "/alpha"]),
+    }
+    base_url = serve(pages)
+
+    for kwargs in ({}, {"concurrency": 4}):
+        site = crawl(base_url, **kwargs)
+
+        assert len(site.crawled_pages) == 2
+        assert site.crawled_urls >= {base_url + "old", base_url + "older"}
+        assert site.wordcount == sum(
+            (page.wordcount for page in site.crawled_pages), Counter()
+        )
+        assert all(len(urls) == 1 for urls in site.content_hashes.values())
+
+
+def test_streamed_crawl_matches_buffered(serve):
+    base_url = serve(small_site())
+
+    buffered = crawl(base_url)
+    streamed = crawl(base_url, stream_threshold=100)
+
+    assert all(page.streamed for page in streamed.crawled_pages)
+    assert streamed.crawled_urls == buffered.crawled_urls
+    assert streamed.wordcount == buffered.wordcount
+    assert streamed.bigrams == buffered.bigrams
+    assert streamed.content_hashes == buffered.content_hashes
+    assert streamed.stats()["transfer"]["streamed_responses"] == 5